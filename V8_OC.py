@@ -1,151 +1,59 @@
-import yfinance as yf
+import asyncio
+import os
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
 import pandas as pd
-import hvplot.pandas
 import panel as pn
 import param
-
-#####-----INITIALIZATION OF VARIABLES AND WIDGETS CREATION-----#################################################################################################################################
+from bokeh.models.widgets.tables import NumberFormatter
+
+from analytics import history_key, panel_returns, rolling_returns
+from downsampling import zoomable_lines
+from etf_data import get_news, get_overview, get_spread_and_volume, spread_and_volume
+from holdings_table import HOLDINGS_COLUMNS, PAGE_SIZE, HoldingsCSVHandler, holdings_index
+from metrics import DEBUG_PANEL, MetricsHandler, instrumented, record_error, registry, timed
+from quotes import SESSION_REFRESH, QuoteSubscription
+from reactive import SharedComputation, debounce, debounced
+from risk import rolling_risk
+from savings_plan import plan_outcomes, summarize
+from shared_cache import fetch_executor, get_price_cache, prefetch_executor, run_in_fetch_pool
+from snapshot import get_snapshot
+
+#####-----INITIALIZATION OF SHARED SETTINGS-----#################################################################################################################################
 
 # enable the panel extension--> allows to work with widgets 
 pn.extension('tabulator') # for interactive data tables
 
-# global variables
-ticker_symbol:str = ''
-
-# ETF input and fetch button 
-etf_input = pn.widgets.TextInput(name="ETF NAME", placeholder="Enter ETF symbol here:")
-fetch_data_button = pn.widgets.Button(name="🔍 Fetch Data", button_type="success", width=300)
-
-# Display panes (1st tab)
-spread_volume_pane = pn.pane.Markdown("### Spread and Volume\n\nEnter an ETF and click Fetch Data to see updates.",
-    styles={"background-color": "#e0e0e0", "padding": "10px",
-            "border": "1px solid #c0c0c0", "border-radius": "5px",
-            "font-size": "16px"}, 
-    width=600,
-    height=350
-)
-
-replication_pane = pn.pane.Markdown("### ETF overview:",
-    styles={"background-color": "#e0e0e0", "padding": "10px",
-            "border": "1px solid #c0c0c0", "border-radius": "5px",
-            "font-size": "16px"}, 
-    width=600, 
-    height=350
-)
-
-news_pane = pn.pane.Markdown("### News\n\nEnter an ETF and click Fetch Data to see updates.",
-    styles={"background-color": "#e0e0e0", "padding": "10px",
-            "border": "1px solid #c0c0c0", "border-radius": "5px",
-            "font-size": "16px"}, 
-    width=1220,
-    height=500
-)
-
-# Widgets for interactive plots (2nd tab)
-wd_plot1_Top = pn.widgets.IntSlider(name='Value Threshold (# companies)', start=1, end=20, value=10)
-wd_plot2_Top = pn.widgets.IntSlider(name='Value Threshold (# sectors)', start=1, end=11, value=10)
-years_input = pn.widgets.IntInput(name='Years', value=5, step=1, start=1)
-
-# Placeholder panes for interactive plots (2nd tab)--> used to update and clear when inserting new ETF
-p1_interactive = pn.Column()
-p2_interactive = pn.Column()
-linked_data = pn.Column()
-linked_data_2 = pn.Column()
-
-#####-----FUNCTIONS-----#########################################################################################################################################
-
-# function to fetch news (Tab 1)
-def get_news(ticker_symbol):
-    '''given a ticker as input it returns a dictionary (5 news) of dictionaries (keys: title, publisher, link), if no error occurs'''
-    try:
-        ticker = yf.Ticker(ticker_symbol)
-        news = ticker.get_news()[:5]
-        news_dict = {
-            i + 1: {
-                "title": item.get("title", "No title"),
-                "publisher": item.get("publisher", "No publisher"),
-                "link": item.get("link", "No link"),
-            }
-            for i, item in enumerate(news)
-        }
-        return news_dict
-    except Exception as e:
-        return {"error": f"An error occurred: {str(e)}"}
-
-# Function to fetch spread and volume (Tab 1)
-def get_spread_and_volume(ticker_symbol):
-    '''given a ticker as input it returns a dictionary with info about bid, ask, spread, currency, volume, if no error occurs'''
-    try:
-        ticker = yf.Ticker(ticker_symbol)
-        info = ticker.info
+NEWS_TIMEOUT = 10  # seconds, a slow news feed never blocks the price panes
 
-        # calculate bid-ask spread
-        bid = info.get('bid', None)
-        ask = info.get('ask', None)
-        currency = info.get('currency', "Unknown")
+# sidebar logo (University of St. Gallen), bundled in assets/ so the page needs no external request
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "hsg_logo.png")
 
-        if bid is not None and ask is not None:
-            spread = ask - bid
-        else:
-            spread = "N/A"
-
-        # fetching historical data for volume
-        hist = ticker.history(period="1d")
-        volume = hist['Volume'].iloc[-1] if not hist.empty else "N/A"
-
-        return {
-            "bid": bid,
-            "ask": ask,
-            "spread": round(spread, ndigits=3) if spread != "N/A" else spread,
-            "currency": currency,
-            "volume": f'{volume:,}'
-        }
-    except Exception as e:
-        return {"error": f"An error occurred: {str(e)}"}
-
-# Callback to update panes and plots (Tab 1)
-def update_panes(event):
-    '''Updates the dashboard with the new ETF data'''
-    global ticker_symbol
-    ticker_symbol = etf_input.value.strip().upper()
-    if not ticker_symbol:
-        
-        # Displaying error messages
-        news_pane.object = "### News\n\nPlease enter a valid ETF symbol!"
-        spread_volume_pane.object = "### Spread and Volume\n\nPlease enter a valid ETF symbol!"
-        replication_pane.object = '### ETF overview:\n\nPlease enter a valid ETF symbol!'
+# ETF_PREWARM=1 (or a comma separated list of tickers to fetch, e.g. SPY,QQQ) warms the process up before serving
+PREWARM = os.environ.get("ETF_PREWARM", "")
 
-        # Clearing interactive plots
-        p1_interactive.clear()
-        p2_interactive.clear()
-        linked_data.clear()
-        linked_data_2.clear()
+# tabs whose content is only computed when they are first shown
+ANALYSIS_TAB = 1
+BENCHMARKING_TAB = 2
 
-        # Clearing benchmarking tab outputs
-        ticker_param.ticker_symbol = ''
-        return
+#####-----FUNCTIONS-----#########################################################################################################################################
 
-    # Update replication pane
+# Functions building the markdown of each pane (Tab 1), run in the fetch thread pool
+def overview_content(ticker_symbol, snapshot):
+    '''returns the markdown of the replication pane'''
+    overview = get_overview(ticker_symbol, snapshot)
+    if "error" in overview:
+        return f"### ETF Overview:\n\nError: {overview['error']}"
     try:
-        ticker = yf.Ticker(ticker_symbol)
-        info = ticker.info
-
-        etf_name = info.get('longName') or info.get('shortName') or ticker_symbol
-
-        # Get current price
-        hist = ticker.history(period='1d')
-        if not hist.empty:
-            current_price = hist['Close'].iloc[-1]
-        else:
-            current_price = 'N/A'
-
-        # Fetch additional ETF information
-        net_assets = info.get('totalAssets', 'N/A')
-        ytd_return = info.get('ytdReturn', 'N/A')
-        etf_yield = info.get('yield', 'N/A')
-        replication = info.get('longBusinessSummary')
-
-        # Format net assets and returns if available
+        net_assets = overview['net_assets']
+        ytd_return = overview['ytd_return']
+        etf_yield = overview['yield']
+        current_price = overview['current_price']
+
+        # Format price, net assets and returns if available
+        if current_price != 'N/A':
+            current_price = f"{current_price:.2f}"
         if net_assets != 'N/A':
             net_assets = f"{net_assets/1e9:.2f}B"  # Convert to billions
         if ytd_return != 'N/A':
@@ -153,365 +61,786 @@ def update_panes(event):
         if etf_yield != 'N/A':
             etf_yield = f"{etf_yield*100:.2f}%"
 
-        replication_pane.object = (
+        return (
             f"### ETF Overview:\n\n"
-            f"- **ETF Name**: {etf_name}\n"
-            f"- **Current Price**: $ {current_price:.2f}\n"
+            f"- **ETF Name**: {overview['name']}\n"
+            f"- **Current Price**: $ {current_price}\n"
             f"- **Net Assets**: $ {net_assets}\n"
             f"- **YTD Daily Total Return**: {ytd_return}\n"
             f"- **Yield**: {etf_yield}\n"
-            f"- **Replication**: {replication}\n"
+            f"- **Replication**: {overview['replication']}\n"
         )
     except Exception as e:
-        replication_pane.object = f"### ETF Overview:\n\nError: {str(e)}"
+        record_error("overview_content", e)
+        return f"### ETF Overview:\n\nError: {str(e)}"
 
-    # Update spread and volume pane
-    spread_volume_data = get_spread_and_volume(ticker_symbol)
-    if "error" in spread_volume_data:
-        spread_volume_pane.object = f"### Spread and Volume\n\nError: {spread_volume_data['error']}"
-    else:
-        spread_volume_content = (
-            f"### Spread and Volume\n\n"
-            f"- **Bid**: {spread_volume_data['bid']}\n"
-            f"- **Ask**: {spread_volume_data['ask']}\n"
-            f"- **Spread**: {spread_volume_data['spread']}\n"
-            f"- **Currency**: {spread_volume_data['currency']}\n"
-            f"- **Daily Volume**: {spread_volume_data['volume']}\n"
-        )
-        spread_volume_pane.object = spread_volume_content
+def spread_volume_content(ticker_symbol, snapshot):
+    '''returns the markdown of the spread and volume pane'''
+    return spread_volume_markdown(get_spread_and_volume(ticker_symbol, snapshot))
 
-    # Update news pane
-    news_dict = get_news(ticker_symbol)
+def spread_volume_markdown(spread_volume_data):
+    '''returns the markdown of the spread and volume pane from the dictionary of get_spread_and_volume'''
+    if "error" in spread_volume_data:
+        return f"### Spread and Volume\n\nError: {spread_volume_data['error']}"
+    volume = spread_volume_data['volume']
+    return (
+        f"### Spread and Volume\n\n"
+        f"- **Bid**: {spread_volume_data['bid']}\n"
+        f"- **Ask**: {spread_volume_data['ask']}\n"
+        f"- **Spread**: {spread_volume_data['spread']}\n"
+        f"- **Currency**: {spread_volume_data['currency']}\n"
+        f"- **Daily Volume**: {volume if volume == 'N/A' else f'{volume:,}'}\n"
+    )
+
+def news_content(ticker_symbol, snapshot):
+    '''returns the markdown of the news pane'''
+    news_dict = get_news(ticker_symbol, snapshot)
     if "error" in news_dict:
-        news_pane.object = f"### News\n\nError: {news_dict['error']}"
-    else:
-        news_content = "### News\n\n"
-        for idx, news in news_dict.items():
-            news_content += f"- **{news['title']}**\n  *{news['publisher']}*\n  [Read more]({news['link']})\n\n"
-        news_pane.object = news_content
-
-    # Update interactive plots
-    update_plots()
-    
-    # Update benchmarking tab
-    ticker_param.ticker_symbol = ticker_symbol  # Update the parameter to trigger updates
-
-# Function to update plots in (Tab 2)
-def update_plots():
-    '''Updates plots that depend on the ticker symbol'''
-    p1_interactive.clear()
-    p2_interactive.clear()
-    linked_data.clear()
-    linked_data_2.clear()
-
-    # Fetch data for plots
-    ticker = yf.Ticker(ticker_symbol)
+        return f"### News\n\nError: {news_dict['error']}"
+    content = "### News\n\n"
+    for idx, news in news_dict.items():
+        content += f"- **{news['title']}**\n  *{news['publisher']}*\n  [Read more]({news['link']})\n\n"
+    return content
+
+async def _run_in_pool(function):
+    '''runs a blocking (network) function in the fetch thread pool without blocking the server'''
+    return await run_in_fetch_pool(function)
+
+def _prefetch(function):
+    '''calls function ignoring errors, they are reported later by the function that uses the data'''
     try:
-        data_2 = ticker.funds_data
-    except Exception as e:
-        data_2 = None
+        function()
+    except Exception:
+        pass
 
+def _outcome(function):
+    '''returns (result, None) of function, or (None, exception) when it fails, so the caller gets the error without calling again'''
     try:
-        prices = ticker.history(period="max")
+        return function(), None
     except Exception as e:
-        prices = None
-
-    # Function to create a bar chart for top companies
-    def p1_Companies_weight(threshold):
-        try:
-            Companies_weig = data_2.top_holdings.reset_index().sort_values(by="Holding Percent", ascending=False)
-            Companies_weig["Position"] = [i + 1 for i in range(len(Companies_weig["Symbol"]))]
-
-            # Filter data based on the threshold
-            filtered_data = Companies_weig[Companies_weig["Position"] <= threshold]
-            sum_weights = filtered_data['Holding Percent'].sum()
-
-            # Create the bar chart
-            plot = filtered_data.hvplot.bar(
-                x='Symbol', y='Holding Percent', color='skyblue',
-                title=f'The Top {threshold} Companies represent {sum_weights:.2%}',
-                rot=90, ylabel="Weight (%)"
-            )
-            return plot
-        except Exception as e:
-            return pn.pane.Markdown(f"### Error\n\nUnable to fetch data for {ticker_symbol}.")
-
-    # Function to create a bar chart for sector weights
-    def p2_Sector_weight(threshold):
-        try:
-            # Create a DataFrame for sector weights
-            sect_we = pd.DataFrame({
-                "Sector": list(data_2.sector_weightings.keys()),
-                "Sector_weight": list(data_2.sector_weightings.values())
-            }).sort_values(by=["Sector_weight"], ascending=False)
-            sect_we["Position"] = [i + 1 for i in range(len(sect_we["Sector"]))]
-
-            # Filter data based on the threshold
-            filtered_data = sect_we[sect_we['Position'] <= threshold]
-            sum_weights = filtered_data['Sector_weight'].sum()
-
-            # Create the bar chart
-            plot = filtered_data.hvplot.bar(
-                x='Sector', y='Sector_weight', color='skyblue',
-                title=f"Top {threshold} sectors representing {sum_weights:.2%} of portfolio",
-                ylabel="Weight (%)"
-            )
-            return plot
-        except Exception as e:
-            return pn.pane.Markdown(f"### Error\n\nUnable to fetch data for {ticker_symbol}.")
-
-    # Function to plot historical returns
-    def returns_plot(years):
-        try:
-            days = years * 252
-            prices[f"{years} Year Close Price Change"] = prices["Close"].pct_change(periods=days)
-            returns_data = prices[f"{years} Year Close Price Change"].dropna()
-            plot = returns_data.hvplot(
-                kind="line", colorbar=False, width=600,
-                title=f"{years}-Year Rolling Returns for {ticker_symbol}"
-            )
-            return plot
-        except Exception as e:
-            return pn.pane.Markdown(f"### Error\n\nUnable to fetch data for {ticker_symbol}.")
-
-    # Function to calculate mean and standard deviation
-    def mean_std(years):
-        try:
-            days = years * 252
-            prices[f"{years} Year Close Price Change"] = prices["Close"].pct_change(periods=days).dropna()
-            mean_return = prices[f"{years} Year Close Price Change"].mean()
-            std_dev = prices[f"{years} Year Close Price Change"].std()
-            return pn.pane.Markdown(
-                "### Key Statistics\n"
-                f"**Mean Return:** {mean_return:.2%}\n**Standard Deviation:** {std_dev:.2%}"
-            )
-            # old--> f"### Key Statistics\n\**Mean Return:** {mean_return:.2%}\n**Standard Deviation:** {std_dev:.2%}"
-        except Exception as e:
-            return f"### Error\n\nUnable to fetch data for {ticker_symbol}."
-
-    # Bind the functions to the widgets
-    p1_plot = pn.bind(p1_Companies_weight, threshold=wd_plot1_Top)
-    p2_plot = pn.bind(p2_Sector_weight, threshold=wd_plot2_Top)
-    returns_plot_bind = pn.bind(returns_plot, years=years_input)
-    mean_std_bind = pn.bind(mean_std, years=years_input)
-
-    # Update the interactive plots
-    p1_interactive.append(p1_plot)
-    p2_interactive.append(p2_plot)
-    linked_data.append(returns_plot_bind)
-    linked_data_2.append(mean_std_bind)
-    #linked_data_2.object = mean_std_bind
-
-# link the fetch data button to the update function (Tab 2)
-fetch_data_button.on_click(update_panes)
-
-# widgets for benchmarking tab (Tab 3)
-investment_years = pn.widgets.IntInput(name='Investment Duration (Years)', value=5, step=1, start=1)
-investment_amount = pn.widgets.IntInput(name='Investment Amount', value=100, start=0)
-investment_period = pn.widgets.Select(name='Frequency of Investment', options=["Yearly", "Monthly", "Quarterly"])
-benchmark_select = pn.widgets.TextInput(name="Benchmark ETF NAME", placeholder="Enter the ETF symbol that will be used as benchmark:") 
+        return None, e
+
+def _warm_up(snapshot, benchmarks, years):
+    '''background prefetch of the heavy data of Tabs 2 and 3 (holdings, full histories, rolling returns)'''
+    _prefetch(lambda: snapshot.funds_data)
+    _prefetch(lambda: rolling_returns(snapshot.ticker_symbol, snapshot.history, years))
+    for benchmark in benchmarks:
+        _prefetch(lambda: get_snapshot(benchmark, get_price_cache()).history)
+
+def load_plotting():
+    '''imports the plotting libraries (hvplot adds .hvplot to DataFrames) the first time a plot is built, they are slow to import'''
+    import holoviews  # noqa: F401
+    import hvplot.pandas  # noqa: F401
+
+async def _fill_pane(name, pane, content_function, timeout=None, timeout_message=""):
+    '''shows a loading indicator on pane until content_function returns its new markdown'''
+    pane.loading = True
+    try:
+        # data: fetching and formatting the content, render: updating the pane (and its bokeh model) with it
+        with timed("etf_pane_data", pane=name):
+            content = await asyncio.wait_for(_run_in_pool(content_function), timeout)
+        with timed("etf_pane_render", pane=name):
+            pane.object = content
+    except asyncio.TimeoutError as e:
+        record_error(f"{name} pane timeout", e)
+        pane.object = timeout_message
+    finally:
+        pane.loading = False
 
 # Using param for ticker symbol (Tab 3)
 class TickerParam(param.Parameterized):
     ticker_symbol = param.String(default='')
 
-ticker_param = TickerParam()
 
 # Function to calculate future value (Tab 3)
-def calculate_future_value(years, amount, period, ticker_param):
+@instrumented("etf_function", function="calculate_future_value")
+def calculate_future_value(years, amount, period, mode, ticker_param):
+    '''backtests investing amount every period for years, from every historical start date (or resampled paths)'''
     ticker = ticker_param.ticker_symbol
     if not ticker:
         return "Please enter a valid ETF symbol and click Fetch Data."
     try:
-        etf = yf.Ticker(ticker)
-        prices = etf.history(period="max")
+        prices = get_snapshot(ticker, get_price_cache()).history
         if prices.empty:
             return f"Error: No price data available for {ticker}."
-        days = years * 252
-        prices[f"{years} Year Close Price Change"] = prices["Close"].pct_change(periods=days)
-        max_return = prices[f"{years} Year Close Price Change"].max()
-        annualised_return = max_return ** (252 / days) - 1
-
-        periods_map = {"Yearly": 1, "Monthly": 12, "Quarterly": 4}
-        n = periods_map[period]
-        if annualised_return == 0:
-            future_value = total_invested = amount * years * n
-            total_return = 0
-        else:
-            future_value = amount * (((1 + annualised_return / n) ** (years * n) - 1) / (annualised_return / n))
-            total_invested = amount * years * n
-            total_return = future_value - total_invested
 
-        #return f"Future Value: ${future_value:,.2f}\nAmount Invested: ${total_invested:,.2f}\nTotal Return: ${total_return:,.2f}"
+        # outcomes are computed for 1 per period and scaled, so changing the amount is free
+        outcomes = plan_outcomes(ticker, prices, years, period, mode)
+        summary = summarize(outcomes, amount, years, period)
+        scenarios = "historical start dates" if mode == "Historical" else "resampled paths"
 
+        card_styles = {'border': '1px solid black', 'padding': '10px', 'border-radius': '5px'}
         return pn.Column(
-            pn.pane.Markdown(f"**Future Value: ${future_value:,.2f}**", styles={'border': '1px solid black', 'padding': '10px', 'border-radius': '5px'}, height=70, width=300, align=('center', 'center')), 
-            pn.pane.Markdown(f"**Amount invested: ${total_invested:,.2f}**", styles={'border': '1px solid black', 'padding': '10px', 'border-radius': '5px'}, height=70, width=300, align=('center', 'center')),
-            pn.pane.Markdown(f"**Total return: ${total_return:,.2f}**", styles={'border': '1px solid black', 'padding': '10px', 'border-radius': '5px'}, height=70, width=300, align=('center', 'center'))
+            pn.pane.Markdown(f"**Median Future Value: ${summary['p50']:,.2f}**", styles=card_styles, height=70, width=300, align=('center', 'center')),
+            pn.pane.Markdown(f"**Amount invested: ${summary['invested']:,.2f}**", styles=card_styles, height=70, width=300, align=('center', 'center')),
+            pn.pane.Markdown(
+                f"| Min | 5% | 25% | Median | 75% | 95% | Max |\n|---|---|---|---|---|---|---|\n"
+                f"| ${summary['min']:,.0f} | ${summary['p5']:,.0f} | ${summary['p25']:,.0f} | ${summary['p50']:,.0f} "
+                f"| ${summary['p75']:,.0f} | ${summary['p95']:,.0f} | ${summary['max']:,.0f} |\n\n"
+                f"*Distribution over {summary['scenarios']:,} {scenarios}.*",
+                width=560
+            )
             )
 
     except Exception as e:
+        record_error("calculate_future_value", e)
         return f"Error: {str(e)}"
 
+# Function to split the benchmark input into symbols (Tab 3)
+def parse_benchmarks(text):
+    '''given a comma or space separated text it returns the list of unique benchmark symbols'''
+    symbols = [symbol.strip().upper() for symbol in text.replace(",", " ").split()]
+    return list(dict.fromkeys(symbol for symbol in symbols if symbol))
+
 # Function to compare benchmarks (Tab 3)
+@instrumented("etf_function", function="compare_benchmarks")
 def compare_benchmarks(years, benchmark, ticker_param):
     ticker = ticker_param.ticker_symbol
     if not ticker:
         return pn.pane.Markdown("### Error\n\nPlease enter a valid ETF symbol and click Fetch Data.")
     try:
-        etf = yf.Ticker(ticker)
-        etf_prices = etf.history(period="max")
-        if etf_prices.empty:
-            return pn.pane.Markdown(f"### Error\n\nNo price data available for {ticker}.")
-
-        days = years * 252
-        etf_prices[f"{years} Year Close Price Change"] = etf_prices["Close"].pct_change(periods=days)
-
-        benchmark_ticker = yf.Ticker(benchmark)
-        benchmark_prices = benchmark_ticker.history(period="max")
-        if benchmark_prices.empty:
-            return pn.pane.Markdown(f"### Error\n\nNo price data available for benchmark {benchmark}.")
+        benchmarks = [symbol for symbol in parse_benchmarks(benchmark) if symbol != ticker]
+        if not benchmarks:
+            return pn.pane.Markdown("### Error\n\nPlease enter at least one benchmark symbol.")
+
+        # histories of the ETF and every benchmark, the missing ones downloaded in one batch request
+        # (this runs in the fetch pool: submitting more work to it from here could starve it)
+        symbols = [ticker] + benchmarks
+        histories = get_price_cache().get_many(symbols)
+        for symbol in symbols:
+            prices = histories.get(symbol)
+            if prices is None or prices.empty:
+                which = "" if symbol == ticker else "benchmark "
+                return pn.pane.Markdown(f"### Error\n\nNo price data available for {which}{symbol}.")
+
+        # one aligned panel for all tickers, rolling returns of every column in one pass
+        returns = panel_returns(histories, years)
+
+        versions = tuple(history_key(prices) for prices in histories.values())
+        return zoomable_lines(returns, (tuple(symbols), "compare_benchmarks", (years, versions)),
+                             width=1000, height=500, legend_position="bottom")
+    except Exception as e:
+        record_error("compare_benchmarks", e)
+        return pn.pane.Markdown(f"### Error\n\n{str(e)}")
 
-        benchmark_prices[f"{years} Year Close Price Change"] = benchmark_prices["Close"].pct_change(periods=days)
+#####-----SESSION: WIDGETS, CALLBACKS AND DASHBOARD DESIGN-----#################################################################################################################################
 
-        merged_prices = pd.merge(
-            etf_prices[[f"{years} Year Close Price Change"]].reset_index(),
-            benchmark_prices[[f"{years} Year Close Price Change"]].reset_index(),
-            on="Date", how="inner"
-        )
-        merged_prices.rename(
-            columns={
-                f"{years} Year Close Price Change_x": ticker,
-                f"{years} Year Close Price Change_y": benchmark
-            },
-            inplace=True
-        )
+def create_app():
+    '''builds the widgets, callbacks and layout of one user session; every session has its own state,
+    while the data (price histories, quotes, analytics) comes from the caches shared by the whole process'''
+    price_cache = get_price_cache()
+    ticker_symbol = ''  # ETF currently displayed in this session
 
-        return merged_prices.hvplot.line(x="Date", y=[ticker, benchmark], height=500, width=1000, legend="bottom")
-    except Exception as e:
-        return pn.pane.Markdown(f"### Error\n\n{str(e)}")
+    # ETF input and fetch button 
+    etf_input = pn.widgets.TextInput(name="ETF NAME", placeholder="Enter ETF symbol here:")
+    fetch_data_button = pn.widgets.Button(name="🔍 Fetch Data", button_type="success", width=300)
+    live_quotes = pn.widgets.Checkbox(name="Live quotes (Spread and Volume)", value=False)
 
-# Create linked outputs (Tab 3)
-investment_output = pn.bind(calculate_future_value, years=investment_years, amount=investment_amount, period=investment_period, ticker_param=ticker_param)
-benchmark_comparison = pn.bind(compare_benchmarks, years=investment_years, benchmark=benchmark_select, ticker_param=ticker_param)
-
-#####-----DASHBOARD DESIGN-----#################################################################################################################################
-
-# Instruction text
-side_text = pn.pane.Markdown(
-    "### Tabs Information\n"
-    "**Overview:** info overview on general ETF info\n"  
-    "**Analysis:** companies, sectors, and returns\n"
-    "**Benchmarking:** return comparison\n"
-    "**PROVA:** testo di prova\n\n"
-    "*ETFs examples: SPY, QQQ, VOO*\n"
-    "*Possible benchmarks: Gold, URTH, SPY*\n",
-    width=300,
-    height=220,
-    styles={
-        'border': '1px solid #c0c0c0',
-        'padding': '10px',
-        'background-color': '#e0e0e0',
-        'border-radius': '10px'
-    }
-)
-
-# Sidebar layout
-sidebar = pn.Column(
-    pn.pane.Image('https://upload.wikimedia.org/wikipedia/de/thumb/7/77/Uni_St_Gallen_Logo.svg/2048px-Uni_St_Gallen_Logo.svg.png', width=150),
-    pn.pane.Markdown("## ETF Selection and Filtering", styles={"font-weight": "bold"}),
-    etf_input,
-    fetch_data_button,
-    side_text
-)
-
-# Tab 1 content (Overview)
-top_row = pn.Row(replication_pane, spread_volume_pane)
-bottom_row = pn.Row(news_pane)
-tab1_content = pn.Column(
-    top_row,
-    bottom_row
-)
-
-# Tab 2 content (Analysis)
-plot1 = pn.Column(
-    "# Top Companies in the ETF",
-    p1_interactive,
-    wd_plot1_Top
-)
-
-plot2 = pn.Column(
-    "# Top Sectors in the ETF",
-    p2_interactive,
-    wd_plot2_Top
-)
-
-stats_and_plot = pn.Row(
-    pn.Column(
-        years_input,
-        linked_data_2
-    ),
-    linked_data
-)
-
-tab2_content = pn.Column(
-    pn.Row(plot1, plot2),
-    stats_and_plot
-)
-
-#Tab 3 content (benchmarking) 
-middle_section = pn.Row(
-    pn.Column(
-        pn.pane.Markdown("### Inputs", margin=(0, 0, 10, 0)),
-        investment_years, 
-        investment_amount, 
-        investment_period, 
-        benchmark_select,
-        styles={"background-color": "#e0e0e0", "padding": "10px", "border": "1px solid #c0c0c0", "border-radius": "5px", "font-size": "16px"}, 
+    # Display panes (1st tab)
+    spread_volume_pane = pn.pane.Markdown("### Spread and Volume\n\nEnter an ETF and click Fetch Data to see updates.",
+        styles={"background-color": "#e0e0e0", "padding": "10px",
+                "border": "1px solid #c0c0c0", "border-radius": "5px",
+                "font-size": "16px"}, 
         width=600,
         height=350
-    ),   
-    pn.Spacer(width=20),  # space between the two boxes
-    pn.Column(
-        pn.pane.Markdown("### Outputs", margin=(0, 0, 10, 0)),
-        pn.panel(investment_output, width_policy="max"),
-        styles={"background-color": "#e0e0e0", "padding": "10px", "border": "1px solid #c0c0c0", "border-radius": "5px", "font-size": "16px"}, 
-        width=600,
+    )
+
+    # Live quotes: the session follows its ticker on the shared poller and re-renders only when the quote changed
+    def render_quote(quote):
+        spread_volume_pane.object = spread_volume_markdown(spread_and_volume(quote))
+    quote_subscription = QuoteSubscription(render_quote)
+    quote_callback = pn.state.add_periodic_callback(quote_subscription.refresh, period=SESSION_REFRESH, start=False)
+
+    def follow_live_quotes(*events):
+        '''follows the displayed ticker while live quotes are on'''
+        if live_quotes.value and ticker_symbol:
+            quote_subscription.follow(ticker_symbol)
+            if not quote_callback.running:
+                quote_callback.start()
+        else:
+            quote_subscription.follow(None)
+            if quote_callback.running:
+                quote_callback.stop()
+
+    live_quotes.param.watch(follow_live_quotes, 'value')
+    if pn.state.curdoc is not None and pn.state.curdoc.session_context is not None:
+        pn.state.on_session_destroyed(lambda session_context: quote_subscription.follow(None))
+
+    replication_pane = pn.pane.Markdown("### ETF overview:",
+        styles={"background-color": "#e0e0e0", "padding": "10px",
+                "border": "1px solid #c0c0c0", "border-radius": "5px",
+                "font-size": "16px"}, 
+        width=600, 
         height=350
-    ),
-    align="start",
-    height=400,
-    margin=(10, 10, 0, 10)
-)
-
-tab3_content = pn.Column(
-    pn.pane.Markdown("## Investment Growth and Benchmark Comparison", height=30, margin=(0, 0, 10, 0)),  
-    middle_section,
-    benchmark_comparison,  
-)
-
-# Tabs
-tabs = pn.Tabs(
-    ('Overview', tab1_content),
-    ('Analysis', tab2_content),
-    ('Benchmarking', tab3_content)
-)
-
-# Template design
-template = pn.template.FastListTemplate(
-    title="ETF Dashboard",
-    sidebar=[sidebar],
-    main=[tabs],
-    theme_toggle=True,
-)
-
-# Changing the color for the header bar in the template
-template.header_background = "green"
-
-# Defining main to display dashboard
-def main():
-    template.show()
+    )
+
+    news_pane = pn.pane.Markdown("### News\n\nEnter an ETF and click Fetch Data to see updates.",
+        styles={"background-color": "#e0e0e0", "padding": "10px",
+                "border": "1px solid #c0c0c0", "border-radius": "5px",
+                "font-size": "16px"}, 
+        width=1220,
+        height=500
+    )
+
+    # Widgets for interactive plots (2nd tab)
+    wd_plot1_Top = pn.widgets.IntSlider(name='Value Threshold (# companies)', start=1, end=20, value=10)
+    wd_plot2_Top = pn.widgets.IntSlider(name='Value Threshold (# sectors)', start=1, end=11, value=10)
+    years_input = pn.widgets.IntInput(name='Years', value=5, step=1, start=1)
+
+    # Placeholder panes for interactive plots (2nd tab)--> used to update and clear when inserting new ETF
+    p1_interactive = pn.Column()
+    p2_interactive = pn.Column()
+    linked_data = pn.Column()
+    linked_data_2 = pn.Column()
+    risk_stats = pn.Column()
+    risk_plot = pn.Column()
+
+    # Widgets for the risk metrics (2nd tab)
+    risk_years = pn.widgets.IntInput(name='Risk window (years)', value=1, step=1, start=1)
+    risk_benchmark = pn.widgets.TextInput(name='Beta benchmark', value='SPY')
+
+    # Full holdings table (2nd tab): paged, sorted and searched on the server, only the visible page is sent
+    holdings_search = pn.widgets.TextInput(name='Search holdings', placeholder='Symbol or name')
+    holdings_min_weight = pn.widgets.FloatInput(name='Minimum weight (%)', value=0.0, step=0.01, start=0.0)
+    holdings_table = pn.widgets.Tabulator(
+        pd.DataFrame(columns=HOLDINGS_COLUMNS), pagination='remote', page_size=PAGE_SIZE, show_index=False,
+        disabled=True, formatters={'Weight': NumberFormatter(format='0.00%')}, layout='fit_data_table', width=700
+    )
+    holdings_export = pn.pane.Markdown("")
+    holdings = None  # HoldingsIndex shown in the table
+    holdings_ticker = ''  # ETF whose holdings are shown
+
+    # widgets for benchmarking tab (Tab 3)
+    investment_years = pn.widgets.IntInput(name='Investment Duration (Years)', value=5, step=1, start=1)
+    investment_amount = pn.widgets.IntInput(name='Investment Amount', value=100, start=0)
+    investment_period = pn.widgets.Select(name='Frequency of Investment', options=["Yearly", "Monthly", "Quarterly"])
+    investment_mode = pn.widgets.Select(name='Simulation', options=["Historical", "Bootstrap"])
+    benchmark_select = pn.widgets.TextInput(name="Benchmark ETF NAMES", placeholder="Enter one or more benchmark symbols, e.g. SPY, URTH, GLD, AGG:") 
+
+    ticker_param = TickerParam()
+
+    # Function to show the holdings matching the search and the minimum weight (Tab 2)
+    def show_holdings(*events):
+        '''hands the matching rows to the table (which only sends their first page) and updates the CSV link'''
+        if holdings is None:
+            holdings_table.value = pd.DataFrame(columns=HOLDINGS_COLUMNS)
+            holdings_export.object = ""
+            return
+        query, min_weight = holdings_search.value, holdings_min_weight.value / 100
+        with timed("etf_pane_render", pane="holdings"):
+            holdings_table.value = holdings.search(query, min_weight)
+            holdings_table.page = 1
+        link = "/holdings.csv?" + urlencode({"ticker": holdings_ticker, "q": query, "min_weight": min_weight})
+        holdings_export.object = f"[Download CSV]({link}) ({len(holdings_table.value):,} holdings)"
+
+    def set_holdings(index, ticker=''):
+        '''switches the table to the HoldingsIndex of ticker (None empties it)'''
+        nonlocal holdings, holdings_ticker
+        holdings, holdings_ticker = index, ticker
+        show_holdings()
+
+    holdings_search.param.watch(show_holdings, 'value')
+    holdings_min_weight.param.watch(show_holdings, 'value')
+
+    # Function to update plots in (Tab 2)
+    def update_plots(ticker_symbol, data_2, prices):
+        '''Updates plots that depend on the ticker symbol, from its holdings and history already fetched (None if unavailable)'''
+        # ticker_symbol is fixed for the views and computations below: the session may have moved on to another
+        # ticker by the time they run, and their results are cached under this ticker
+        p1_interactive.clear()
+        p2_interactive.clear()
+        linked_data.clear()
+        linked_data_2.clear()
+        risk_stats.clear()
+        risk_plot.clear()
+
+        # Full holdings, indexed once per ticker for the server-side search of the table
+        try:
+            set_holdings(holdings_index(ticker_symbol, data_2.top_holdings) if data_2 is not None else None, ticker_symbol)
+        except Exception as e:
+            record_error("holdings_table", e)
+            set_holdings(None)
+
+        # Shared intermediates: holdings and sectors are ranked once per ticker, rolling returns once per years value,
+        # and every view depending on them reuses the result
+        @SharedComputation
+        def ranked_companies():
+            Companies_weig = data_2.top_holdings.reset_index().sort_values(by="Holding Percent", ascending=False)
+            Companies_weig["Position"] = [i + 1 for i in range(len(Companies_weig["Symbol"]))]
+            return Companies_weig
+
+        @SharedComputation
+        def ranked_sectors():
+            sect_we = pd.DataFrame({
+                "Sector": list(data_2.sector_weightings.keys()),
+                "Sector_weight": list(data_2.sector_weightings.values())
+            }).sort_values(by=["Sector_weight"], ascending=False)
+            sect_we["Position"] = [i + 1 for i in range(len(sect_we["Sector"]))]
+            return sect_we
+
+        @SharedComputation
+        def returns_for(years):
+            engine = rolling_returns(ticker_symbol, prices, years)
+            return engine.series(years), engine.stats(years)
+
+        # Function to create a bar chart for top companies
+        @debounced
+        @instrumented("etf_function", function="p1_Companies_weight")
+        async def p1_Companies_weight(threshold):
+            try:
+                Companies_weig = await ranked_companies.get()
+
+                # Filter data based on the threshold
+                filtered_data = Companies_weig[Companies_weig["Position"] <= threshold]
+                sum_weights = filtered_data['Holding Percent'].sum()
+
+                # Create the bar chart
+                plot = filtered_data.hvplot.bar(
+                    x='Symbol', y='Holding Percent', color='skyblue',
+                    title=f'The Top {threshold} Companies represent {sum_weights:.2%}',
+                    rot=90, ylabel="Weight (%)"
+                )
+                return plot
+            except Exception as e:
+                record_error("p1_Companies_weight", e)
+                return pn.pane.Markdown(f"### Error\n\nUnable to fetch data for {ticker_symbol}.")
+
+        # Function to create a bar chart for sector weights
+        @debounced
+        @instrumented("etf_function", function="p2_Sector_weight")
+        async def p2_Sector_weight(threshold):
+            try:
+                sect_we = await ranked_sectors.get()
+
+                # Filter data based on the threshold
+                filtered_data = sect_we[sect_we['Position'] <= threshold]
+                sum_weights = filtered_data['Sector_weight'].sum()
+
+                # Create the bar chart
+                plot = filtered_data.hvplot.bar(
+                    x='Sector', y='Sector_weight', color='skyblue',
+                    title=f"Top {threshold} sectors representing {sum_weights:.2%} of portfolio",
+                    ylabel="Weight (%)"
+                )
+                return plot
+            except Exception as e:
+                record_error("p2_Sector_weight", e)
+                return pn.pane.Markdown(f"### Error\n\nUnable to fetch data for {ticker_symbol}.")
+
+        # Function to plot historical returns
+        @debounced
+        @instrumented("etf_function", function="returns_plot")
+        async def returns_plot(years):
+            try:
+                returns_data, _ = await returns_for.get(years)
+                # downsampled on the server to the plot width, more detail is sent when zooming in
+                plot = zoomable_lines(
+                    returns_data.to_frame(ticker_symbol), (ticker_symbol, "returns_plot", (years, history_key(prices))),
+                    width=600, title=f"{years}-Year Rolling Returns for {ticker_symbol}", show_legend=False
+                )
+                return plot
+            except Exception as e:
+                record_error("returns_plot", e)
+                return pn.pane.Markdown(f"### Error\n\nUnable to fetch data for {ticker_symbol}.")
+
+        # Function to calculate mean and standard deviation
+        @debounced
+        @instrumented("etf_function", function="mean_std")
+        async def mean_std(years):
+            try:
+                _, (mean_return, std_dev) = await returns_for.get(years)
+                return pn.pane.Markdown(
+                    "### Key Statistics\n"
+                    f"**Mean Return:** {mean_return:.2%}\n**Standard Deviation:** {std_dev:.2%}"
+                )
+                # old--> f"### Key Statistics\n\**Mean Return:** {mean_return:.2%}\n**Standard Deviation:** {std_dev:.2%}"
+            except Exception as e:
+                record_error("mean_std", e)
+                return f"### Error\n\nUnable to fetch data for {ticker_symbol}."
+
+        # Rolling risk metrics, updated incrementally when new bars are appended to the history
+        @SharedComputation
+        def risk_for(years, benchmark):
+            benchmark = benchmark.strip().upper()
+            benchmark_prices = get_snapshot(benchmark, price_cache).history if benchmark else None
+            engine = rolling_risk(ticker_symbol, prices, years, benchmark or None, benchmark_prices)
+            return engine.frame(), engine.latest()
+
+        # Function to show the latest risk metrics
+        @debounced
+        @instrumented("etf_function", function="risk_metrics")
+        async def risk_metrics(years, benchmark):
+            try:
+                _, latest = await risk_for.get(years, benchmark)
+                beta = "N/A" if pd.isna(latest['Beta']) else f"{latest['Beta']:.2f}"
+                return pn.pane.Markdown(
+                    f"### Risk over the last {years} year(s)\n"
+                    f"| Metric | Value |\n|---|---|\n"
+                    f"| Volatility (annualized) | {latest['Volatility']:.2%} |\n"
+                    f"| Sharpe ratio | {latest['Sharpe']:.2f} |\n"
+                    f"| Sortino ratio | {latest['Sortino']:.2f} |\n"
+                    f"| Beta vs {benchmark.strip().upper() or '-'} | {beta} |\n"
+                    f"| Max drawdown | {latest['Max Drawdown']:.2%} |\n"
+                    f"| Current drawdown | {latest['Drawdown']:.2%} ({latest['Drawdown Duration']:.0f} trading days since the peak) |\n",
+                    width=420
+                )
+            except Exception as e:
+                record_error("risk_metrics", e)
+                return pn.pane.Markdown(f"### Error\n\nUnable to compute the risk metrics of {ticker_symbol}: {str(e)}")
+
+        # Function to plot the rolling volatility and drawdowns
+        @debounced
+        @instrumented("etf_function", function="risk_chart")
+        async def risk_chart(years, benchmark):
+            try:
+                frame, _ = await risk_for.get(years, benchmark)
+                return zoomable_lines(
+                    frame[["Volatility", "Max Drawdown", "Drawdown"]],
+                    (ticker_symbol, "risk_chart", (years, benchmark, history_key(prices))),
+                    width=700, title=f"{years}-Year Rolling Volatility and Drawdowns for {ticker_symbol}", legend_position="bottom"
+                )
+            except Exception as e:
+                record_error("risk_chart", e)
+                return pn.pane.Markdown(f"### Error\n\nUnable to fetch data for {ticker_symbol}.")
+
+        # Bind the functions to the widgets
+        p1_plot = pn.bind(p1_Companies_weight, threshold=wd_plot1_Top)
+        p2_plot = pn.bind(p2_Sector_weight, threshold=wd_plot2_Top)
+        returns_plot_bind = pn.bind(returns_plot, years=years_input)
+        mean_std_bind = pn.bind(mean_std, years=years_input)
+
+        # Update the interactive plots
+        p1_interactive.append(p1_plot)
+        p2_interactive.append(p2_plot)
+        linked_data.append(returns_plot_bind)
+        linked_data_2.append(mean_std_bind)
+        #linked_data_2.object = mean_std_bind
+        risk_stats.append(pn.bind(risk_metrics, years=risk_years, benchmark=risk_benchmark))
+        risk_plot.append(pn.bind(risk_chart, years=risk_years, benchmark=risk_benchmark))
+
+    async def _load_plots(snapshot):
+        '''fetches the holdings and history (usually already prefetched) in the pool, then builds the plots of Tab 2'''
+        plot_panes = [p1_interactive, p2_interactive, linked_data, linked_data_2, risk_stats, risk_plot, holdings_table]
+        for pane in plot_panes:
+            pane.loading = True
+        try:
+            # the values or errors are passed on, so the event loop never reads the snapshot (a failed field is fetched again)
+            with timed("etf_pane_data", pane="analysis"):
+                (data_2, funds_error), (prices, history_error), _ = await asyncio.gather(
+                    _run_in_pool(lambda: _outcome(lambda: snapshot.funds_data)),
+                    _run_in_pool(lambda: _outcome(lambda: snapshot.history)),
+                    _run_in_pool(load_plotting),
+                )
+            if funds_error is not None:
+                record_error("funds_data", funds_error)
+            if history_error is not None:
+                record_error("history", history_error)
+            # Update interactive plots (the plots themselves are timed by their etf_function histograms)
+            with timed("etf_pane_render", pane="analysis"):
+                update_plots(snapshot.ticker_symbol, data_2, prices)
+        finally:
+            for pane in plot_panes:
+                pane.loading = False
+
+    async def _load_benchmarking(snapshot):
+        '''waits for the histories of the ETF and the benchmarks, then triggers the outputs of Tab 3'''
+        prefetches = [_run_in_pool(lambda: _prefetch(lambda: snapshot.history))]
+        for benchmark in parse_benchmarks(benchmark_select.value):
+            prefetches.append(_run_in_pool(lambda benchmark=benchmark: _prefetch(lambda: get_snapshot(benchmark, price_cache).history)))
+        with timed("etf_pane_data", pane="benchmarking"):
+            await asyncio.gather(*prefetches)
+        with timed("etf_pane_render", pane="benchmarking"):
+            ticker_param.ticker_symbol = snapshot.ticker_symbol  # Update the parameter to trigger updates
+
+    loaded_tabs = {}  # tab index -> ticker its content was computed for
+    current_snapshot = None
+
+    async def activate_tab(index):
+        '''computes the content of a tab the first time it is shown for the current ticker'''
+        if current_snapshot is None or loaded_tabs.get(index) == ticker_symbol:
+            return
+        loaded_tabs[index] = ticker_symbol
+        if index == ANALYSIS_TAB:
+            await _load_plots(current_snapshot)
+        elif index == BENCHMARKING_TAB:
+            await _load_benchmarking(current_snapshot)
+
+    async def show_tab(index):
+        '''switches to tab index and waits until its content is computed'''
+        tabs.active = index
+        await activate_tab(index)
+
+    async def _on_tab_change(event):
+        await activate_tab(event.new)
+
+    # Callback to update panes and plots (Tab 1)
+    async def update_panes(event):
+        '''Updates the dashboard with the new ETF data, returns the future of the background prefetch'''
+        nonlocal ticker_symbol, current_snapshot
+        ticker_symbol = etf_input.value.strip().upper()
+        loaded_tabs.clear()
+        follow_live_quotes()
+        if not ticker_symbol:
+            current_snapshot = None
+        
+            # Displaying error messages
+            news_pane.object = "### News\n\nPlease enter a valid ETF symbol!"
+            spread_volume_pane.object = "### Spread and Volume\n\nPlease enter a valid ETF symbol!"
+            replication_pane.object = '### ETF overview:\n\nPlease enter a valid ETF symbol!'
+
+            # Clearing interactive plots
+            p1_interactive.clear()
+            p2_interactive.clear()
+            linked_data.clear()
+            linked_data_2.clear()
+            risk_stats.clear()
+            risk_plot.clear()
+            set_holdings(None)
+
+            # Clearing benchmarking tab outputs
+            ticker_param.ticker_symbol = ''
+            return
+
+        # One snapshot per click: every pane and plot below shares its fetches
+        snapshot = current_snapshot = get_snapshot(ticker_symbol, price_cache, refresh=True)
+
+        # Plots of the previous ETF are dropped, Tabs 2 and 3 are recomputed when they are shown
+        p1_interactive.clear()
+        p2_interactive.clear()
+        linked_data.clear()
+        linked_data_2.clear()
+        risk_stats.clear()
+        risk_plot.clear()
+        set_holdings(None)
+
+        # Heavy data of the hidden tabs is fetched in the background while the overview is read
+        benchmarks = parse_benchmarks(benchmark_select.value + " " + risk_benchmark.value)
+        prefetch = prefetch_executor.submit(_warm_up, snapshot, benchmarks, years_input.value)
+
+        # All independent requests start at once, each pane renders as soon as its own data arrives
+        await asyncio.gather(
+            _fill_pane("overview", replication_pane, lambda: overview_content(snapshot.ticker_symbol, snapshot)),
+            _fill_pane("spread_volume", spread_volume_pane, lambda: spread_volume_content(snapshot.ticker_symbol, snapshot)),
+            _fill_pane("news", news_pane, lambda: news_content(snapshot.ticker_symbol, snapshot), timeout=NEWS_TIMEOUT,
+                       timeout_message="### News\n\nError: the news request timed out."),
+            activate_tab(tabs.active),
+        )
+        return prefetch
+
+    # link the fetch data button to the update function (Tab 1)
+    fetch_data_button.on_click(update_panes)
+
+    # Create linked outputs (Tab 3): debounced, computed in the thread pool, a newer input cancels a pending output
+    async def future_value_view(years, amount, period, mode, ticker_param):
+        await debounce()
+        return await _run_in_pool(lambda: calculate_future_value(years, amount, period, mode, ticker_param))
+
+    async def benchmark_view(years, benchmark, ticker_param):
+        await debounce()
+        return await _run_in_pool(lambda: compare_benchmarks(years, benchmark, ticker_param))
+
+    investment_output = pn.bind(future_value_view, years=investment_years, amount=investment_amount, period=investment_period, mode=investment_mode, ticker_param=ticker_param)
+    benchmark_comparison = pn.bind(benchmark_view, years=investment_years, benchmark=benchmark_select, ticker_param=ticker_param)
+
+
+    # Dashboard design
+    # Instruction text
+    side_text = pn.pane.Markdown(
+        "### Tabs Information\n"
+        "**Overview:** info overview on general ETF info\n"  
+        "**Analysis:** companies, sectors, and returns\n"
+        "**Benchmarking:** return comparison\n"
+        "**PROVA:** testo di prova\n\n"
+        "*ETFs examples: SPY, QQQ, VOO*\n"
+        "*Possible benchmarks: GLD, URTH, SPY, AGG (comma separated)*\n",
+        width=300,
+        height=220,
+        styles={
+            'border': '1px solid #c0c0c0',
+            'padding': '10px',
+            'background-color': '#e0e0e0',
+            'border-radius': '10px'
+        }
+    )
+
+    # Sidebar layout
+    sidebar = pn.Column(
+        pn.pane.Image(LOGO_PATH, width=150),
+        pn.pane.Markdown("## ETF Selection and Filtering", styles={"font-weight": "bold"}),
+        etf_input,
+        fetch_data_button,
+        live_quotes,
+        side_text
+    )
+
+    # Optional debug panel with the live metrics (ETF_DEBUG=1 or ?debug=1 in the URL)
+    if DEBUG_PANEL or pn.state.session_args.get('debug', [b''])[0] in (b'1', b'true'):
+        debug_pane = pn.pane.Markdown(registry.summary_markdown(), width=300, styles={'font-size': '11px'})
+        sidebar.append(pn.Card(debug_pane, title="Debug: metrics", collapsed=True, width=300))
+        def update_debug_pane():
+            debug_pane.object = registry.summary_markdown()
+        pn.state.add_periodic_callback(update_debug_pane, period=2000)
+
+    # Tab 1 content (Overview)
+    top_row = pn.Row(replication_pane, spread_volume_pane)
+    bottom_row = pn.Row(news_pane)
+    tab1_content = pn.Column(
+        top_row,
+        bottom_row
+    )
+
+    # Tab 2 content (Analysis)
+    plot1 = pn.Column(
+        "# Top Companies in the ETF",
+        p1_interactive,
+        wd_plot1_Top
+    )
+
+    plot2 = pn.Column(
+        "# Top Sectors in the ETF",
+        p2_interactive,
+        wd_plot2_Top
+    )
+
+    stats_and_plot = pn.Row(
+        pn.Column(
+            years_input,
+            linked_data_2
+        ),
+        linked_data
+    )
+
+    risk_section = pn.Column(
+        "# Risk Metrics",
+        pn.Row(
+            pn.Column(
+                risk_years,
+                risk_benchmark,
+                risk_stats
+            ),
+            risk_plot
+        )
+    )
+
+    holdings_section = pn.Column(
+        "# All Holdings",
+        pn.Row(holdings_search, holdings_min_weight),
+        holdings_table,
+        holdings_export
+    )
+
+    tab2_content = pn.Column(
+        pn.Row(plot1, plot2),
+        stats_and_plot,
+        risk_section,
+        holdings_section
+    )
+
+    #Tab 3 content (benchmarking) 
+    middle_section = pn.Row(
+        pn.Column(
+            pn.pane.Markdown("### Inputs", margin=(0, 0, 10, 0)),
+            investment_years, 
+            investment_amount, 
+            investment_period, 
+            investment_mode,
+            benchmark_select,
+            styles={"background-color": "#e0e0e0", "padding": "10px", "border": "1px solid #c0c0c0", "border-radius": "5px", "font-size": "16px"}, 
+            width=600,
+            height=420
+        ),   
+        pn.Spacer(width=20),  # space between the two boxes
+        pn.Column(
+            pn.pane.Markdown("### Outputs", margin=(0, 0, 10, 0)),
+            pn.panel(investment_output, width_policy="max"),
+            styles={"background-color": "#e0e0e0", "padding": "10px", "border": "1px solid #c0c0c0", "border-radius": "5px", "font-size": "16px"}, 
+            width=600,
+            height=420
+        ),
+        align="start",
+        height=470,
+        margin=(10, 10, 0, 10)
+    )
+
+    tab3_content = pn.Column(
+        pn.pane.Markdown("## Investment Growth and Benchmark Comparison", height=30, margin=(0, 0, 10, 0)),  
+        middle_section,
+        benchmark_comparison,  
+    )
+
+    # Tabs (dynamic: only the active tab is sent to the browser, its content is computed on first activation)
+    tabs = pn.Tabs(
+        ('Overview', tab1_content),
+        ('Analysis', tab2_content),
+        ('Benchmarking', tab3_content),
+        dynamic=True
+    )
+    tabs.param.watch(_on_tab_change, 'active')
+
+    # Template design
+    template = pn.template.FastListTemplate(
+        title="ETF Dashboard",
+        sidebar=[sidebar],
+        main=[tabs],
+        theme_toggle=True,
+    )
+
+    # Changing the color for the header bar in the template
+    template.header_background = "green"
+
+    return SimpleNamespace(
+        template=template, etf_input=etf_input, fetch_data_button=fetch_data_button, update_panes=update_panes,
+        tabs=tabs, show_tab=show_tab, live_quotes=live_quotes, quote_subscription=quote_subscription,
+        replication_pane=replication_pane, spread_volume_pane=spread_volume_pane, news_pane=news_pane,
+        p1_interactive=p1_interactive, p2_interactive=p2_interactive, linked_data=linked_data, linked_data_2=linked_data_2,
+        wd_plot1_Top=wd_plot1_Top, wd_plot2_Top=wd_plot2_Top, years_input=years_input,
+        risk_stats=risk_stats, risk_plot=risk_plot, risk_years=risk_years, risk_benchmark=risk_benchmark,
+        holdings_search=holdings_search, holdings_min_weight=holdings_min_weight, holdings_table=holdings_table,
+        holdings_export=holdings_export,
+        investment_years=investment_years, investment_amount=investment_amount, investment_period=investment_period,
+        investment_mode=investment_mode, benchmark_select=benchmark_select, ticker_param=ticker_param,
+        investment_output=investment_output, benchmark_comparison=benchmark_comparison,
+    )
+
+# App factory: Panel calls it once per browser session
+def app():
+    return create_app().template
+
+# Optional warm-up before accepting sessions
+def prewarm(ticker_symbols=()):
+    '''imports the plotting libraries, builds one throw-away session and fetches the data of ticker_symbols'''
+    with timed("etf_prewarm"):
+        load_plotting()
+        create_app()
+        price_cache = get_price_cache()
+
+        def warm(ticker_symbol):
+            snapshot = get_snapshot(ticker_symbol, price_cache)
+            for field in ("info", "history_1d", "news"):
+                _prefetch(lambda: getattr(snapshot, field))
+            _warm_up(snapshot, [], years=5)
+
+        list(fetch_executor.map(warm, ticker_symbols))
+
+def _prewarm_tickers():
+    '''tickers of ETF_PREWARM (none for ETF_PREWARM=1)'''
+    return [symbol for symbol in PREWARM.replace(",", " ").upper().split() if symbol not in ("1", "TRUE", "YES")]
+
+# Defining main to display dashboard (every browser tab gets its own session), with the /metrics and /holdings.csv endpoints
+def main(port=5006, prewarm_tickers=None):
+    if prewarm_tickers is None and PREWARM:
+        prewarm_tickers = _prewarm_tickers()
+    if prewarm_tickers is not None:
+        prewarm(prewarm_tickers)
+    pn.serve(app, port=port, show=True, title="ETF Dashboard", extra_patterns=[("/metrics", MetricsHandler), ("/holdings.csv", HoldingsCSVHandler)])
 
 # If condition to avoid double calls
 if __name__ == '__main__':
     main()
+elif __name__.startswith('bokeh'):
+    # started with `panel serve V8_OC.py`: the script runs once per session
+    # (with --warm it also runs once at startup, so ETF_PREWARM warms the process up before the first user)
+    if PREWARM and not pn.state.cache.get("etf_prewarmed"):
+        pn.state.cache["etf_prewarmed"] = True
+        prewarm(_prewarm_tickers())
+    app().servable()
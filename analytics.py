@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from derived_cache import DerivedCache
+from metrics import register_cache
+
+#####-----ROLLING RETURNS ENGINE-----#################################################################################################################################
+
+# shared cache of every derived series/matrix, bounded in bytes (ETF_ANALYTICS_CACHE_MB, default 256 MB)
+analytics_cache = DerivedCache(max_bytes=int(os.environ.get("ETF_ANALYTICS_CACHE_MB", 256)) * 1024 ** 2)
+register_cache("analytics", analytics_cache.stats)
+
+
+class RollingReturns:
+    '''Returns over every horizon of 1 to max_years years for each trading day of a price history.
+    The start of a N-year window is the last trading day on or before the same calendar date N years earlier.'''
+
+    def __init__(self, close, max_years):
+        close = close.dropna()
+        self.dates = close.index
+        self.max_years = max_years
+        self.matrix = self._compute(close.to_numpy(dtype=float))
+
+    def _compute(self, close):
+        '''builds the (max_years x days) return matrix in one vectorized pass'''
+        matrix = np.full((self.max_years, len(self.dates)), np.nan)
+        if len(self.dates) == 0:
+            return matrix
+        starts, valid = window_starts(self.dates, range(1, self.max_years + 1))
+        start_prices = close[starts]
+        matrix[valid] = (close[np.newaxis, :] / start_prices - 1)[valid]
+        return matrix
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes + self.dates.nbytes
+
+    def series(self, years):
+        '''returns the rolling years-year returns as a Series indexed by date (without the first incomplete years)'''
+        if years > self.max_years:
+            raise ValueError(f"History too short for a {years}-year horizon (max {self.max_years} years).")
+        return pd.Series(self.matrix[years - 1], index=self.dates, name=f"{years} Year Close Price Change").dropna()
+
+    def stats(self, years):
+        '''returns mean and standard deviation of the rolling years-year returns'''
+        returns = self.series(years)
+        return returns.mean(), returns.std()
+
+
+def window_starts(dates, horizons):
+    '''for every horizon (years) and date, position of the last bar on or before the same date years earlier.
+    Returns (starts, valid) arrays of shape (horizons x days); windows starting before the first bar are not valid.'''
+    day_times = dates.asi8
+    targets = np.vstack([(dates - pd.DateOffset(years=years)).asi8 for years in horizons])
+    starts = np.searchsorted(day_times, targets, side="right") - 1
+    valid = targets >= day_times[0]
+    return np.where(valid, starts, 0), valid
+
+
+def rolling_returns(ticker_symbol, prices, years=1):
+    '''returns the cached RollingReturns of ticker_symbol, recomputed only when prices changed or years is not covered'''
+    key = (ticker_symbol, "rolling_returns", history_key(prices))
+    engine = analytics_cache.get(key)
+    if engine is None or years > engine.max_years:
+        # every horizon the history can cover is computed at once, so changing years is a lookup
+        engine = analytics_cache.put(key, RollingReturns(prices["Close"], max_years=max(years, history_years(prices.index))))
+    return engine
+
+
+def history_key(prices):
+    '''identifies a version of a price history (it only changes when bars are appended)'''
+    return (len(prices), prices.index[-1] if len(prices) else None)
+
+
+def history_years(dates):
+    '''number of full calendar years covered by dates'''
+    if len(dates) == 0:
+        return 1
+    return max(1, (dates[-1] - dates[0]).days // 365)
+
+
+#####-----ALIGNED MULTI-TICKER PANELS-----#################################################################################################################################
+
+
+class AlignedPanel:
+    '''Close prices of several tickers on their common trading days: values has one column per ticker'''
+
+    def __init__(self, tickers, dates, values):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.values = values
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.dates.nbytes
+
+    def add_column(self, ticker_symbol, close):
+        '''returns a new panel with one more ticker, aligned by a join of the two sorted date indexes'''
+        close = close.dropna()
+        common = np.intersect1d(self.dates.asi8, close.index.asi8, assume_unique=True)
+        rows = np.searchsorted(self.dates.asi8, common)
+        new_rows = np.searchsorted(close.index.asi8, common)
+        values = np.column_stack([self.values[rows], close.to_numpy(dtype=float)[new_rows]])
+        return AlignedPanel(self.tickers + [ticker_symbol], self.dates[rows], values)
+
+    def rolling_returns(self, years):
+        '''returns the years-year rolling returns of every column at once, as a DataFrame indexed by date'''
+        starts, valid = window_starts(self.dates, [years])
+        returns = self.values / self.values[starts[0]] - 1
+        returns[~valid[0]] = np.nan
+        return pd.DataFrame(returns, index=self.dates, columns=self.tickers).dropna(how="all")
+
+
+def aligned_panel(histories):
+    '''returns the cached AlignedPanel of histories (dict ticker -> prices, in display order).
+    Panels are built one column at a time on top of the cached panel of the previous tickers,
+    so adding a benchmark only joins one more column.'''
+    tickers = list(histories)
+    versions = tuple(history_key(histories[ticker]) for ticker in tickers)
+    key = (tuple(tickers), "aligned_panel", versions)
+    panel = analytics_cache.get(key)
+    if panel is not None:
+        return panel
+    if len(tickers) == 1:
+        close = histories[tickers[0]]["Close"].dropna()
+        panel = AlignedPanel(tickers, close.index, close.to_numpy(dtype=float).reshape(-1, 1))
+    else:
+        previous = aligned_panel({ticker: histories[ticker] for ticker in tickers[:-1]})
+        panel = previous.add_column(tickers[-1], histories[tickers[-1]]["Close"])
+    return analytics_cache.put(key, panel)
+
+
+def panel_returns(histories, years):
+    '''returns the cached years-year rolling returns of every ticker of histories, aligned on common dates'''
+    versions = tuple(history_key(prices) for prices in histories.values())
+    key = (tuple(histories), "panel_returns", (years, versions))
+    return analytics_cache.get_or_compute(key, lambda: aligned_panel(histories).rolling_returns(years))
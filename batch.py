@@ -0,0 +1,213 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analytics import RollingReturns, analytics_cache, panel_returns
+from etf_data import get_overview, get_spread_and_volume
+from price_cache import DEFAULT_CACHE_DIR, PriceCache
+from providers import FakeProvider, YFinanceProvider
+from savings_plan import PERIODS_PER_YEAR, historical_outcomes, summarize
+from snapshot import TickerSnapshot
+
+#####-----HEADLESS BATCH MODE-----#################################################################################################################################
+# Computes the dashboard analytics for a list of tickers without the user interface, e.g.
+#   python batch.py SPY QQQ VOO --benchmark URTH --output screen.csv
+#   python batch.py --tickers-file universe.txt --output screen.parquet --workers 16
+
+# output columns and their types (fixed, so every streamed chunk has the same schema)
+COLUMNS = {
+    "ticker": str, "name": str, "currency": str, "current_price": float, "net_assets": float,
+    "ytd_return": float, "yield": float, "bid": float, "ask": float, "spread": float, "volume": float,
+    "return_mean": float, "return_std": float, "return_last": float,
+    "plan_invested": float, "plan_min": float, "plan_p5": float, "plan_median": float, "plan_p95": float, "plan_max": float,
+    "benchmark": str, "benchmark_return_mean": float, "excess_return_mean": float, "benchmark_correlation": float,
+    "error": str,
+}
+
+# benchmark history sent once to every worker process instead of once per ticker
+_worker_benchmark = None
+
+
+def _init_worker(benchmark):
+    global _worker_benchmark
+    _worker_benchmark = benchmark
+    # every ticker is analyzed once, so nothing a worker derives is read again: the analytics cache keeps nothing
+    analytics_cache.max_bytes = 0
+
+
+def _number(value):
+    '''float value of a metric, NaN for "N/A" or missing values'''
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def analyze_ticker(task):
+    '''computes the overview, spread/volume, rolling return, savings plan and benchmark figures of one ticker.
+    task is (ticker_symbol, prices, info, years, amount, period); runs in a worker process'''
+    ticker_symbol, prices, info, years, amount, period = task
+    row = {column: None for column in COLUMNS}
+    row["ticker"] = ticker_symbol
+    try:
+        if prices.empty:
+            raise ValueError(f"No price data available for {ticker_symbol}.")
+        snapshot = TickerSnapshot.preloaded(ticker_symbol, info=info, history_1d=prices.iloc[-1:], history=prices)
+
+        overview = get_overview(ticker_symbol, snapshot)
+        spread_volume = get_spread_and_volume(ticker_symbol, snapshot)
+        for result in (overview, spread_volume):
+            if "error" in result:
+                raise ValueError(result["error"])
+        row.update(name=overview["name"], currency=spread_volume["currency"])
+        for column, value in (("current_price", overview["current_price"]), ("net_assets", overview["net_assets"]),
+                              ("ytd_return", overview["ytd_return"]), ("yield", overview["yield"]),
+                              ("bid", spread_volume["bid"]), ("ask", spread_volume["ask"]),
+                              ("spread", spread_volume["spread"]), ("volume", spread_volume["volume"])):
+            row[column] = _number(value)
+
+        # computed directly rather than through the cached rolling_returns/plan_outcomes, which would keep them
+        returns = RollingReturns(prices["Close"], max_years=years).series(years)
+        row.update(return_mean=returns.mean(), return_std=returns.std(),
+                   return_last=returns.iloc[-1] if len(returns) else np.nan)
+
+        summary = summarize(historical_outcomes(prices["Close"], years, period), amount, years, period)
+        row.update(plan_invested=summary["invested"], plan_min=summary["min"], plan_p5=summary["p5"],
+                   plan_median=summary["p50"], plan_p95=summary["p95"], plan_max=summary["max"])
+
+        if _worker_benchmark is not None:
+            benchmark_symbol, benchmark_prices = _worker_benchmark
+            aligned = panel_returns({ticker_symbol: prices, benchmark_symbol: benchmark_prices}, years)
+            row.update(benchmark=benchmark_symbol,
+                       benchmark_return_mean=aligned[benchmark_symbol].mean(),
+                       excess_return_mean=(aligned[ticker_symbol] - aligned[benchmark_symbol]).mean(),
+                       benchmark_correlation=aligned[ticker_symbol].corr(aligned[benchmark_symbol]))
+    except Exception as e:
+        row["error"] = str(e)
+    return row
+
+
+def _parquet_schema():
+    '''Arrow schema of the output columns, fixed so a chunk whose text columns are all None still has string columns'''
+    import pyarrow as pa
+    return pa.schema([(column, pa.float64() if kind is float else pa.string()) for column, kind in COLUMNS.items()])
+
+
+class ResultWriter:
+    '''streams result rows to a CSV or Parquet file (chosen by the extension), one chunk at a time'''
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith(".parquet")
+        self._file = None
+        self._writer = None
+
+    def write(self, rows):
+        frame = pd.DataFrame(rows, columns=list(COLUMNS))
+        for column, kind in COLUMNS.items():
+            frame[column] = frame[column].astype("float64" if kind is float else "object")
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = _parquet_schema()
+            table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, schema)
+            self._writer.write_table(table)
+        else:
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(COLUMNS)
+            self._writer.writerows(frame.itertuples(index=False, name=None))
+            self._file.flush()
+
+    def close(self):
+        if self.parquet and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def run_batch(ticker_symbols, output, provider=None, benchmark=None, years=5, amount=100, period="Monthly",
+              workers=None, batch_size=100, cache_dir=DEFAULT_CACHE_DIR, fetch_workers=8):
+    '''computes the analytics of every ticker and streams them to output (CSV or Parquet).
+    Histories are fetched per batch (one request per batch when the provider supports it),
+    analytics are spread over a process pool. Returns the number of rows written.'''
+    price_cache = PriceCache(provider, cache_dir=cache_dir)
+    ticker_symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in ticker_symbols if symbol.strip()))
+
+    benchmark_data = None
+    if benchmark:
+        benchmark = benchmark.strip().upper()
+        benchmark_data = (benchmark, price_cache.get_history(benchmark))
+
+    def fetch_info(ticker_symbol):
+        try:
+            return price_cache.provider.info(ticker_symbol)
+        except Exception:
+            return {}
+
+    writer = ResultWriter(output)
+    written = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(benchmark_data,)) as pool, \
+                ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+            for chunk in _chunks(ticker_symbols, batch_size):
+                histories = price_cache.get_many(chunk)
+                infos = dict(zip(chunk, fetch_pool.map(fetch_info, chunk)))
+                tasks = [(ticker_symbol, histories.get(ticker_symbol, pd.DataFrame(columns=["Close"])),
+                          infos[ticker_symbol], years, amount, period) for ticker_symbol in chunk]
+                chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+                rows = list(pool.map(analyze_ticker, tasks, chunksize=chunksize))
+                writer.write(rows)
+                written += len(rows)
+    finally:
+        writer.close()
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the ETF dashboard analytics for many tickers.")
+    parser.add_argument("tickers", nargs="*", help="ticker symbols")
+    parser.add_argument("--tickers-file", help="file with one ticker symbol per line")
+    parser.add_argument("--output", default="etf_batch.csv", help="output file, .csv or .parquet")
+    parser.add_argument("--benchmark", help="benchmark symbol for the comparison figures")
+    parser.add_argument("--years", type=int, default=5, help="rolling return and savings plan horizon")
+    parser.add_argument("--amount", type=float, default=100, help="savings plan contribution")
+    parser.add_argument("--period", choices=list(PERIODS_PER_YEAR), default="Monthly", help="savings plan frequency")
+    parser.add_argument("--workers", type=int, help="analytics processes (default: number of cores)")
+    parser.add_argument("--batch-size", type=int, default=100, help="tickers fetched per request")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="price history cache folder")
+    parser.add_argument("--provider", choices=["yfinance", "fake"], default="yfinance",
+                        help="data source, 'fake' generates deterministic offline data")
+    args = parser.parse_args(argv)
+
+    ticker_symbols = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file) as file:
+            ticker_symbols += [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    if not ticker_symbols:
+        parser.error("no tickers given")
+
+    provider = FakeProvider() if args.provider == "fake" else YFinanceProvider()
+    start = time.perf_counter()
+    written = run_batch(ticker_symbols, args.output, provider=provider, benchmark=args.benchmark, years=args.years,
+                        amount=args.amount, period=args.period, workers=args.workers, batch_size=args.batch_size,
+                        cache_dir=args.cache_dir)
+    print(f"{written} tickers written to {args.output} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
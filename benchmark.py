@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import Future
+
+from analytics import analytics_cache
+from providers import FakeProvider
+from reactive import evaluate
+from shared_cache import set_provider
+from snapshot import clear_snapshots
+
+#####-----OFFLINE BENCHMARK SUITE-----#################################################################################################################################
+# Times the dashboard code paths on deterministic synthetic data (no network), e.g.
+#   python benchmark.py --save benchmark_baseline.json
+#   python benchmark.py --compare benchmark_baseline.json
+#   python benchmark.py --startup-only --budget 5
+
+DEFAULT_SIZES = [1, 10, 30, 100]  # years of daily bars
+BENCHMARKS = "URTH, GLD, AGG, SPY"
+
+
+def fresh_session(years, holdings=10):
+    '''new dashboard session on a synthetic provider with empty caches'''
+    import V8_OC as app
+    provider = FakeProvider(years=years, holdings=holdings)
+    set_provider(provider, cache_dir=tempfile.mkdtemp(prefix="etf_benchmark_"))
+    analytics_cache.clear()
+    clear_snapshots()
+    session = app.create_app()
+    session.etf_input.value = "ETF"
+    session.benchmark_select.value = BENCHMARKS
+    return session
+
+
+def _horizon(years):
+    '''plan and comparison length fitting in the history (None when it is too short for any)'''
+    return min(5, years // 2) or None
+
+
+def _render_tab2(session, years_values):
+    for column in (session.p1_interactive, session.p2_interactive):
+        for item in column:
+            evaluate(item.object)
+    for years in years_values:
+        session.years_input.value = years
+        for column in (session.linked_data, session.linked_data_2, session.risk_stats, session.risk_plot):
+            for item in column:
+                evaluate(item.object)
+
+
+def load(session, *tabs):
+    '''fetches the ticker of session, waits for the background prefetch and computes the given tabs'''
+    async def run():
+        prefetch = await session.update_panes(None)
+        prefetch.result()
+        for index in tabs:
+            await session.show_tab(index)
+    asyncio.run(run())
+
+
+# each case prepares its state outside the timed part and returns the function to time (None: size not applicable)
+def case_update_panes(years):
+    '''first paint of the Overview tab (the background prefetch is not timed)'''
+    session = fresh_session(years)
+    return lambda: asyncio.run(session.update_panes(None))
+
+
+def case_switch_tabs(years):
+    '''computing the Analysis and Benchmarking tabs once the prefetch is done'''
+    session = fresh_session(years)
+    load(session)
+
+    async def show_tabs():
+        await session.show_tab(1)
+        await session.show_tab(2)
+    return lambda: asyncio.run(show_tabs())
+
+
+def case_update_plots(years):
+    session = fresh_session(years)
+    load(session, 1)
+    horizons = list(range(1, max(2, min(years, 10))))
+    return lambda: _render_tab2(session, horizons)
+
+
+def case_future_value(years, mode="Historical"):
+    import V8_OC as app
+    if _horizon(years) is None:
+        return None
+    session = fresh_session(years)
+    load(session, 2)
+    horizon = _horizon(years)
+    analytics_cache.clear()
+    return lambda: app.calculate_future_value(horizon, 100, "Monthly", mode, session.ticker_param)
+
+
+def case_future_value_bootstrap(years):
+    return case_future_value(years, mode="Bootstrap")
+
+
+def case_compare_benchmarks(years):
+    import V8_OC as app
+    if _horizon(years) is None:
+        return None
+    session = fresh_session(years)
+    load(session, 2)
+    horizon = _horizon(years)
+    analytics_cache.clear()
+    return lambda: app.compare_benchmarks(horizon, BENCHMARKS, session.ticker_param)
+
+
+def case_search_holdings(years, holdings=10_000):
+    '''server-side search and filter of a 10,000-row holdings table, and the page sent after each'''
+    session = fresh_session(years, holdings=holdings)
+    load(session, 1)
+
+    def search():
+        for query, min_weight in (("s00", 0.0), ("company s01", 0.0), ("", 0.01), ("", 0.0)):
+            session.holdings_search.value, session.holdings_min_weight.value = query, min_weight
+            session.holdings_table.page = 2
+            session.holdings_table.sorters = [{"field": "Weight", "dir": "asc"}]
+            session.holdings_table.sorters = []
+    return search
+
+
+CASES = {
+    "update_panes": case_update_panes,
+    "switch_tabs": case_switch_tabs,
+    "update_plots": case_update_plots,
+    "calculate_future_value": case_future_value,
+    "calculate_future_value_bootstrap": case_future_value_bootstrap,
+    "compare_benchmarks": case_compare_benchmarks,
+    "search_holdings": case_search_holdings,
+}
+
+
+def measure(case, years, repeat):
+    '''returns median time, throughput (daily bars per second) and peak traced memory of one case at one size'''
+    times = []
+    for _ in range(repeat):
+        function = CASES[case](years)
+        if function is None:
+            return None
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+        if isinstance(result, Future):
+            result.result()  # background work must not overlap the next run
+    # memory in a separate run: tracing allocations slows the code down several times
+    function = CASES[case](years)
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if isinstance(result, Future):
+        result.result()
+    median = statistics.median(times)
+    bars = years * 252
+    return {"case": case, "years": years, "seconds": median, "bars_per_second": bars / median, "peak_mb": peak / 1024 ** 2}
+
+
+def run(sizes=DEFAULT_SIZES, cases=None, repeat=3):
+    results = []
+    for case in cases or list(CASES):
+        for years in sizes:
+            result = measure(case, years, repeat)
+            if result is None:
+                continue
+            results.append(result)
+            print(f"{case:34s} {years:4d}y  {result['seconds'] * 1000:9.1f} ms  "
+                  f"{result['bars_per_second']:12,.0f} bars/s  {result['peak_mb']:8.1f} MB peak", file=sys.stderr)
+    return results
+
+
+# cold start of a fresh interpreter: imports, first session, and the optional warm-up on synthetic data
+STARTUP_SCRIPT = '''
+import json, resource, tempfile, time
+start = time.perf_counter()
+import V8_OC
+imported = time.perf_counter()
+V8_OC.create_app()
+first_session = time.perf_counter()
+from providers import FakeProvider
+from shared_cache import set_provider
+set_provider(FakeProvider(years=30), cache_dir=tempfile.mkdtemp(prefix="etf_benchmark_"))
+warm_start = time.perf_counter()
+V8_OC.prewarm(["ETF"])
+prewarmed = time.perf_counter()
+print(json.dumps({"startup_import": imported - start, "startup_first_session": first_session - imported,
+                  "startup_prewarm": prewarmed - warm_start,
+                  "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+'''
+
+
+def measure_startup(repeat):
+    '''median cold start times over repeat fresh interpreters (peak memory is the resident size of the process)'''
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    results = []
+    for case in ("startup_import", "startup_first_session", "startup_prewarm"):
+        seconds = statistics.median(run[case] for run in runs)
+        results.append({"case": case, "years": 0, "seconds": seconds, "bars_per_second": 0,
+                        "peak_mb": max(run["peak_mb"] for run in runs)})
+        print(f"{case:34s}        {seconds * 1000:9.1f} ms  {results[-1]['peak_mb']:30.1f} MB peak", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''prints the time ratio of every case against the baseline; returns the cases slower than 1 + tolerance'''
+    previous = {(row["case"], row["years"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get((row["case"], row["years"]))
+        if old is None:
+            continue
+        ratio = row["seconds"] / old["seconds"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{row['case']:34s} {row['years']:4d}y  x{ratio:5.2f} time  x{row['peak_mb'] / max(old['peak_mb'], 1e-9):5.2f} memory  {flag}")
+        if flag:
+            regressions.append(row)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ETF dashboard on synthetic market data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="history lengths in years")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), help="cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the median is reported")
+    parser.add_argument("--save", help="write the results to this JSON file (e.g. a new baseline)")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a case is a regression")
+    parser.add_argument("--startup", action="store_true", help="also time the cold start in fresh interpreters")
+    parser.add_argument("--startup-only", action="store_true", help="only time the cold start")
+    parser.add_argument("--budget", type=float, help="seconds allowed from import to the first session (exit 1 if over)")
+    args = parser.parse_args(argv)
+
+    results = [] if args.startup_only else run(args.sizes, args.cases, args.repeat)
+    if args.startup or args.startup_only or args.budget is not None:
+        startup = measure_startup(args.repeat)
+        results += startup
+        cold_start = sum(row["seconds"] for row in startup if row["case"] in ("startup_import", "startup_first_session"))
+        if args.budget is not None and cold_start > args.budget:
+            print(f"cold start {cold_start:.2f}s is over the budget of {args.budget:.2f}s", file=sys.stderr)
+            sys.exit(1)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from analytics import analytics_cache
+
+#####-----SERVER-SIDE DOWNSAMPLING FOR LONG TIME SERIES-----#################################################################################################################################
+
+POINTS_PER_PIXEL = 1  # points sent to the browser per pixel of plot width
+
+
+def lttb(x, y, n_out):
+    '''Largest-Triangle-Three-Buckets: positions of n_out points of (x, y) that keep the visual shape of the line'''
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = x.astype(float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 buckets between the first and last point
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        # average of the next bucket (the last point for the last bucket)
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        # point of the bucket forming the largest triangle with the previous selected point and the next average
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax(x, y, n_out):
+    '''min/max decimation: positions of the lowest and highest point of n_out // 2 buckets (keeps every spike)'''
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    buckets = n_out // 2
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    size = int(np.max(np.diff(edges)))
+    # pad every bucket to the same size to take min and max of all buckets at once
+    positions = np.minimum(edges[:-1, np.newaxis] + np.arange(size), n - 1)
+    inside = edges[:-1, np.newaxis] + np.arange(size) < edges[1:, np.newaxis]
+    values = np.where(inside, y[positions], np.nan)
+    lows = positions[np.arange(buckets), np.nanargmin(values, axis=1)]
+    highs = positions[np.arange(buckets), np.nanargmax(values, axis=1)]
+    return np.unique(np.concatenate([lows, highs]))
+
+
+ALGORITHMS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample(series, n_out, algorithm="lttb"):
+    '''returns at most n_out points of a date indexed series, chosen by algorithm ("lttb" or "minmax")'''
+    series = series.dropna()
+    if len(series) <= n_out:
+        return series
+    positions = ALGORITHMS[algorithm](series.index.asi8, series.to_numpy(dtype=float), n_out)
+    return series.iloc[positions]
+
+
+def _visible(frame, x_range):
+    '''rows of frame inside the x range of the plot'''
+    if x_range is None or None in x_range:
+        return frame
+    start, end = (pd.Timestamp(value) for value in x_range)
+    if frame.index.tz is not None:
+        start, end = start.tz_localize(frame.index.tz), end.tz_localize(frame.index.tz)
+    start_row, end_row = frame.index.searchsorted([start, end])
+    # one point beyond each side, so the line reaches the borders of the plot
+    return frame.iloc[max(start_row - 1, 0):end_row + 1]
+
+
+def zoomable_lines(frame, cache_key, width, algorithm="lttb", points_per_pixel=POINTS_PER_PIXEL, **opts):
+    '''DynamicMap drawing one line per column of frame with about width * points_per_pixel points per line.
+    The full view is cached under cache_key; zooming in downsamples only the visible dates, adding detail.'''
+    import holoviews as hv  # imported with the first plot, it is slow to import
+
+    n_out = max(3, int(width * points_per_pixel))
+    columns = list(frame.columns)
+
+    def full_view():
+        return {column: downsample(frame[column], n_out, algorithm) for column in columns}
+
+    def view(x_range):
+        visible = _visible(frame, x_range)
+        if len(visible) == len(frame):
+            lines = analytics_cache.get_or_compute(cache_key + ((n_out, algorithm),), full_view)
+        else:
+            lines = {column: downsample(visible[column], n_out, algorithm) for column in columns}
+        curves = [hv.Curve((lines[column].index, lines[column].to_numpy()), "Date", "Return", label=str(column))
+                  for column in columns]
+        if len(curves) == 1:
+            return curves[0].opts(width=width, **opts)
+        return hv.Overlay(curves).opts(width=width, **opts)
+
+    return hv.DynamicMap(view, streams=[hv.streams.RangeX()])
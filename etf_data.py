@@ -0,0 +1,76 @@
+from metrics import record_error
+from providers import make_quote
+from snapshot import get_snapshot
+
+#####-----ETF DATA FUNCTIONS (no user interface)-----#################################################################################################################################
+
+# function to fetch news (Tab 1)
+def get_news(ticker_symbol, snapshot=None):
+    '''given a ticker as input it returns a dictionary (5 news) of dictionaries (keys: title, publisher, link), if no error occurs'''
+    try:
+        snapshot = snapshot or get_snapshot(ticker_symbol)
+        news = snapshot.news[:5]
+        news_dict = {
+            i + 1: {
+                "title": item.get("title", "No title"),
+                "publisher": item.get("publisher", "No publisher"),
+                "link": item.get("link", "No link"),
+            }
+            for i, item in enumerate(news)
+        }
+        return news_dict
+    except Exception as e:
+        record_error("get_news", e)
+        return {"error": f"An error occurred: {str(e)}"}
+
+# Function to fetch spread and volume (Tab 1)
+def get_spread_and_volume(ticker_symbol, snapshot=None):
+    '''given a ticker as input it returns a dictionary with info about bid, ask, spread, currency, volume, if no error occurs'''
+    try:
+        snapshot = snapshot or get_snapshot(ticker_symbol)
+        return spread_and_volume(make_quote(snapshot.info, snapshot.history_1d))
+    except Exception as e:
+        record_error("get_spread_and_volume", e)
+        return {"error": f"An error occurred: {str(e)}"}
+
+def spread_and_volume(quote):
+    '''given a quote (bid, ask, currency, volume) it returns the dictionary of get_spread_and_volume'''
+    bid = quote.get('bid', None)
+    ask = quote.get('ask', None)
+
+    # calculate bid-ask spread
+    if bid is not None and ask is not None:
+        spread = round(ask - bid, ndigits=3)
+    else:
+        spread = "N/A"
+
+    return {
+        "bid": bid,
+        "ask": ask,
+        "spread": spread,
+        "currency": quote.get('currency', "Unknown"),
+        "volume": quote.get('volume', "N/A")
+    }
+
+# Function to fetch the overview metrics (Tab 1)
+def get_overview(ticker_symbol, snapshot=None):
+    '''given a ticker as input it returns a dictionary with name, current price, net assets, YTD return, yield and replication, if no error occurs'''
+    try:
+        snapshot = snapshot or get_snapshot(ticker_symbol)
+        info = snapshot.info
+
+        # Get current price
+        hist = snapshot.history_1d
+        current_price = hist['Close'].iloc[-1] if not hist.empty else 'N/A'
+
+        return {
+            "name": info.get('longName') or info.get('shortName') or ticker_symbol,
+            "current_price": current_price,
+            "net_assets": info.get('totalAssets', 'N/A'),
+            "ytd_return": info.get('ytdReturn', 'N/A'),
+            "yield": info.get('yield', 'N/A'),
+            "replication": info.get('longBusinessSummary'),
+        }
+    except Exception as e:
+        record_error("get_overview", e)
+        return {"error": f"An error occurred: {str(e)}"}
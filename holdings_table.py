@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from analytics import analytics_cache
+from metrics import record_error
+from shared_cache import fetch_executor, get_price_cache
+from snapshot import get_snapshot
+
+#####-----FULL HOLDINGS TABLE (server-side search, paging and CSV export)-----#################################################################################################################################
+
+PAGE_SIZE = 25  # rows sent to the browser per page
+CSV_CHUNK_ROWS = 1000  # rows written per chunk of the CSV export
+HOLDINGS_COLUMNS = ["Rank", "Symbol", "Name", "Weight"]
+
+
+class HoldingsIndex:
+    '''Full holdings of a fund prepared once for browsing on the server: ranked by weight, with a lower-case
+    search key per row, so a search or filter is one vectorized scan of cached columns'''
+
+    def __init__(self, top_holdings):
+        names = top_holdings["Name"] if "Name" in top_holdings else pd.Series("", index=top_holdings.index)
+        frame = pd.DataFrame({
+            "Symbol": top_holdings.index.astype(str),
+            "Name": names.fillna("").astype(str).to_numpy(),
+            "Weight": pd.to_numeric(top_holdings["Holding Percent"], errors="coerce").to_numpy(),
+        }).sort_values("Weight", ascending=False, kind="stable").reset_index(drop=True)
+        frame.insert(0, "Rank", np.arange(1, len(frame) + 1))
+        self.frame = frame
+        self._keys = (frame["Symbol"] + " " + frame["Name"]).str.lower()
+
+    @property
+    def nbytes(self):
+        return int(self.frame.memory_usage(deep=True).sum() + self._keys.memory_usage(deep=True))
+
+    def search(self, query="", min_weight=0.0):
+        '''rows whose symbol or name contains query (case-insensitive) and whose weight is at least min_weight'''
+        mask = np.ones(len(self.frame), dtype=bool)
+        query = query.strip().lower()
+        if query:
+            mask &= self._keys.str.contains(query, regex=False).to_numpy()
+        if min_weight:
+            mask &= (self.frame["Weight"] >= min_weight).to_numpy()
+        return self.frame if mask.all() else self.frame[mask]
+
+
+def holdings_index(ticker_symbol, top_holdings):
+    '''returns the cached HoldingsIndex of a fund, rebuilt only when its holdings changed (symbols, names or weights)'''
+    key = (ticker_symbol, "holdings_index", int(pd.util.hash_pandas_object(top_holdings).sum()))
+    return analytics_cache.get_or_compute(key, lambda: HoldingsIndex(top_holdings))
+
+
+def csv_chunks(frame, chunk_rows=CSV_CHUNK_ROWS):
+    '''yields frame as CSV text, chunk_rows rows at a time (the header comes with the first chunk)'''
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0)
+
+
+try:
+    import tornado.web
+
+    class HoldingsCSVHandler(tornado.web.RequestHandler):
+        '''/holdings.csv?ticker=SPY&q=apple&min_weight=0.001: holdings of a fund matching the search, streamed as CSV in chunks'''
+
+        async def get(self):
+            ticker_symbol = self.get_argument("ticker", "").strip().upper()
+            query = self.get_argument("q", "")
+            if not ticker_symbol:
+                raise tornado.web.HTTPError(400, "missing ticker")
+            try:
+                min_weight = float(self.get_argument("min_weight", 0))
+            except ValueError:
+                raise tornado.web.HTTPError(400, "min_weight is not a number")
+            try:
+                funds = await asyncio.get_running_loop().run_in_executor(
+                    fetch_executor, lambda: get_snapshot(ticker_symbol, get_price_cache()).funds_data)
+                frame = holdings_index(ticker_symbol, funds.top_holdings).search(query, min_weight)
+            except Exception as e:
+                record_error("holdings csv", e)
+                raise tornado.web.HTTPError(502, f"no holdings for {ticker_symbol}")
+            self.set_header("Content-Type", "text/csv; charset=utf-8")
+            self.set_header("Content-Disposition", f'attachment; filename="{ticker_symbol}_holdings.csv"')
+            for chunk in csv_chunks(frame):
+                self.write(chunk)
+                await self.flush()  # sends the chunk before the next one is built
+
+    # `panel serve V8_OC.py --plugins metrics --plugins holdings_table` adds these routes to the Panel server
+    ROUTES = [("/holdings.csv", HoldingsCSVHandler, {})]
+except ImportError:  # tornado comes with panel/bokeh; without it only the search and chunking are available
+    HoldingsCSVHandler = None
+    ROUTES = []
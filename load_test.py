@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from providers import FakeProvider
+
+#####-----LOAD TEST: MANY SIMULATED SESSIONS AGAINST A LOCAL FAKE PROVIDER-----#################################################################################################################################
+# Example: python load_test.py --sessions 100 --tickers SPY QQQ VOO --latency 0.2
+
+
+class CountingProvider(FakeProvider):
+    '''FakeProvider with a simulated network latency, counting the upstream requests per method'''
+
+    def __init__(self, latency=0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.counts = {}
+        self._counts_lock = threading.Lock()
+
+    def _request(self, method):
+        with self._counts_lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+        time.sleep(self.latency)
+
+    def history(self, ticker_symbol, start=None):
+        self._request("history")
+        return super().history(ticker_symbol, start)
+
+    def history_many(self, ticker_symbols, start=None):
+        self._request("history_many")
+        return super().history_many(ticker_symbols, start)
+
+    def history_1d(self, ticker_symbol):
+        self._request("history_1d")
+        return super().history_1d(ticker_symbol)
+
+    def info(self, ticker_symbol):
+        self._request("info")
+        return super().info(ticker_symbol)
+
+    def quotes(self, ticker_symbols):
+        self._request("quotes")
+        return super().quotes(ticker_symbols)
+
+    def news(self, ticker_symbol):
+        self._request("news")
+        return super().news(ticker_symbol)
+
+    def funds_data(self, ticker_symbol):
+        self._request("funds_data")
+        return super().funds_data(ticker_symbol)
+
+
+async def _evaluate(view):
+    result = view()
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+async def _render(session):
+    '''evaluates every bound function of a session on the event loop, like the server does after a click
+    (their blocking parts run in the fetch pool, so the views themselves must not)'''
+    for column in (session.p1_interactive, session.p2_interactive, session.linked_data, session.linked_data_2,
+                   session.risk_stats, session.risk_plot):
+        for item in column:
+            await _evaluate(item.object)
+    await _evaluate(session.investment_output)
+    await _evaluate(session.benchmark_comparison)
+
+
+async def simulate_session(app, ticker_symbol, benchmarks, think_time):
+    '''one user: opens the dashboard, looks up a ticker and opens every tab; returns the latency in seconds'''
+    await asyncio.sleep(random.uniform(0, think_time))
+    session = app.create_app()
+    session.etf_input.value = ticker_symbol
+    session.benchmark_select.value = benchmarks
+    start = time.perf_counter()
+    await session.update_panes(None)
+    await session.show_tab(app.ANALYSIS_TAB)
+    await session.show_tab(app.BENCHMARKING_TAB)
+    await _render(session)
+    return time.perf_counter() - start
+
+
+async def run_load_test(sessions, tickers, benchmarks="URTH", latency=0.1, think_time=1.0, seed=0):
+    '''runs sessions concurrent simulated users against a fake provider; returns latencies and upstream counts'''
+    import V8_OC as app
+    from shared_cache import set_provider
+
+    provider = CountingProvider(latency=latency, years=30)
+    set_provider(provider, cache_dir=tempfile.mkdtemp(prefix="etf_load_test_"))
+    random.seed(seed)
+    picks = [random.choice(tickers) for _ in range(sessions)]
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(simulate_session(app, ticker, benchmarks, think_time) for ticker in picks))
+    return {
+        "sessions": sessions,
+        "distinct_tickers": len(set(picks)),
+        "wall_time": time.perf_counter() - start,
+        "latencies": np.array(latencies),
+        "upstream_requests": dict(provider.counts),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate many dashboard sessions against a local fake provider.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--tickers", nargs="+", default=["SPY", "QQQ", "VOO", "URTH", "GLD"])
+    parser.add_argument("--benchmarks", default="URTH, AGG")
+    parser.add_argument("--latency", type=float, default=0.1, help="simulated seconds per upstream request")
+    parser.add_argument("--think-time", type=float, default=1.0, help="sessions start spread over this many seconds")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_load_test(args.sessions, args.tickers, args.benchmarks, args.latency, args.think_time))
+    latencies = result["latencies"]
+    print(f"{result['sessions']} sessions on {result['distinct_tickers']} tickers in {result['wall_time']:.1f}s")
+    print(f"latency p50 {np.percentile(latencies, 50):.2f}s  p95 {np.percentile(latencies, 95):.2f}s  max {latencies.max():.2f}s")
+    print("upstream requests:", ", ".join(f"{method}={count}" for method, count in sorted(result["upstream_requests"].items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import functools
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+#####-----INSTRUMENTATION (latency histograms, payload sizes, cache hit rates, errors)-----#################################################################################################################################
+
+logger = logging.getLogger("etf_dashboard")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)  # seconds
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, math.inf)  # bytes
+
+# on-page debug panel, also enabled per session with ?debug=1 in the URL
+DEBUG_PANEL = os.environ.get("ETF_DEBUG", "") not in ("", "0")
+
+
+class Histogram:
+    '''Cumulative bucket counts, sum and count of observed values (Prometheus histogram)'''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        '''approximate quantile: upper bound of the bucket holding it'''
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return math.inf
+
+
+class MetricsRegistry:
+    '''Thread-safe store of histograms and counters, rendered in the Prometheus text format'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> value
+        self._collectors = []  # callables returning [(name, labels dict, value)] gauges read at scrape time
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _gauges(self):
+        gauges = []
+        for collector in list(self._collectors):
+            try:
+                gauges.extend(collector())
+            except Exception:
+                logger.exception("metrics collector failed")
+        return gauges
+
+    def render(self):
+        '''returns every metric in the Prometheus text exposition format'''
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in histograms:
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_labels(labels)} {value:g}" for (metric, labels), value in counters if metric == name)
+        gauges = self._gauges()
+        for name in sorted({name for name, _, _ in gauges}):
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_labels(tuple(sorted(labels.items())))} {value:g}"
+                         for metric, labels, value in gauges if metric == name)
+        return "\n".join(lines) + "\n"
+
+    def summary_markdown(self):
+        '''short markdown table of the latency histograms and counters, for the on-page debug panel'''
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        rows = ["| Metric | Calls | Mean | p95 |", "|---|---|---|---|"]
+        for (name, labels), histogram in histograms:
+            if histogram.buckets is not LATENCY_BUCKETS or histogram.count == 0:
+                continue
+            label = ", ".join(str(value) for _, value in labels)
+            rows.append(f"| {name} {label} | {histogram.count} | {histogram.sum / histogram.count * 1000:.0f} ms "
+                        f"| ≤ {histogram.quantile(0.95) * 1000:.0f} ms |")
+        rows += ["", "| Counter | Value |", "|---|---|"]
+        rows += [f"| {name} {', '.join(str(value) for _, value in labels)} | {value:g} |" for (name, labels), value in counters]
+        rows += [f"| {name} {', '.join(str(value) for value in labels.values())} | {value:g} |" for name, labels, value in self._gauges()]
+        return "\n".join(rows)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(name, **labels):
+    '''records the duration of the block in the {name}_seconds histogram and failures in {name}_errors_total.
+    A block left by a cancellation (an async view replaced by a newer evaluation) records nothing.'''
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc(f"{name}_errors_total", **labels)
+        registry.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+        raise
+    registry.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+
+def instrumented(name, **labels):
+    '''decorator timing every call of the function (or coroutine function) with timed()'''
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timed(name, **labels):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(name, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_error(where, error):
+    '''counts and logs an exception that is shown to the user as an error message instead of being raised'''
+    registry.inc("etf_errors_total", where=where, error=type(error).__name__)
+    logger.warning("%s failed: %s", where, error, exc_info=error)
+
+
+def record_payload(method, value, size_of):
+    '''records the size in bytes of an upstream answer'''
+    try:
+        registry.observe("etf_upstream_payload_bytes", size_of(value), buckets=SIZE_BUCKETS, method=method)
+    except Exception:
+        pass
+
+
+def register_cache(name, stats):
+    '''exposes the hits, misses, entries (and size/evictions when available) of a cache as gauges'''
+    def collect():
+        values = stats()
+        gauges = [(f"etf_cache_{key}", {"cache": name}, value) for key, value in values.items()]
+        requests = values.get("hits", 0) + values.get("misses", 0)
+        if requests:
+            gauges.append(("etf_cache_hit_ratio", {"cache": name}, values.get("hits", 0) / requests))
+        return gauges
+    registry.add_collector(collect)
+
+
+try:
+    import tornado.web
+
+    class MetricsHandler(tornado.web.RequestHandler):
+        '''/metrics endpoint served next to the Panel app'''
+
+        def get(self):
+            self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.write(registry.render())
+
+    # `panel serve V8_OC.py --plugins metrics` adds these routes to the Panel server
+    ROUTES = [("/metrics", MetricsHandler, {})]
+except ImportError:  # tornado comes with panel/bokeh; without it only the registry is available
+    MetricsHandler = None
+    ROUTES = []
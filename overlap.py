@@ -0,0 +1,273 @@
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from metrics import record_error, register_cache
+from providers import FakeProvider
+from shared_cache import fetch_executor, get_price_cache, set_provider
+from snapshot import get_snapshot
+
+#####-----HOLDINGS OVERLAP ACROSS MANY ETFS-----#################################################################################################################################
+# Example: python overlap.py SPY QQQ VOO IVV --basket SPY=0.6 QQQ=0.4
+
+PAIRS_PER_CHUNK = 4_000_000  # bounds the memory of the security self-join of a full build
+REBUILD_FRACTION = 0.125  # more changed funds than this fraction of the universe: rebuild instead of row updates
+
+
+class OverlapEngine:
+    '''Look-through of many ETFs: a sparse ETF x security weight matrix (one row of triplets per fund), a dense
+    ETF x sector matrix, and the pairwise overlap (sum of the weights two funds have in common) and cosine
+    similarity built from them. Changing one fund's holdings only recomputes its row and column.'''
+
+    def __init__(self):
+        self.tickers = []  # row -> ticker
+        self._rows = {}  # ticker -> row
+        self.securities = []  # column -> security symbol
+        self._columns = {}
+        self.sectors = []  # sector column -> sector name
+        self._sector_columns = {}
+        self._holdings = {}  # row -> (security columns, weights) sorted by column
+        self._sector_weights = {}  # row -> {sector column: weight}
+        self._overlap = np.zeros((0, 0))  # sum of the common weights
+        self._dot = np.zeros((0, 0))  # dot product of the weight vectors
+        self._built = False
+        self._dirty = set()  # rows changed since the matrices were computed
+        self._lock = threading.RLock()
+        self.full_builds = 0
+        self.row_updates = 0
+
+    def _row(self, ticker_symbol):
+        row = self._rows.get(ticker_symbol)
+        if row is None:
+            row = self._rows[ticker_symbol] = len(self.tickers)
+            self.tickers.append(ticker_symbol)
+        return row
+
+    def _column(self, symbol):
+        column = self._columns.get(symbol)
+        if column is None:
+            column = self._columns[symbol] = len(self.securities)
+            self.securities.append(symbol)
+        return column
+
+    def _sector_column(self, sector):
+        column = self._sector_columns.get(sector)
+        if column is None:
+            column = self._sector_columns[sector] = len(self.sectors)
+            self.sectors.append(sector)
+        return column
+
+    def update(self, ticker_symbol, top_holdings, sector_weightings):
+        '''stores the holdings (DataFrame indexed by Symbol with "Holding Percent") and sector weights of a fund;
+        returns False when they did not change'''
+        weights = pd.to_numeric(top_holdings["Holding Percent"], errors="coerce").fillna(0.0)
+        with self._lock:
+            columns = np.array([self._column(str(symbol)) for symbol in top_holdings.index], dtype=np.int64)
+            # a security listed twice counts once with the summed weight
+            columns, positions = np.unique(columns, return_inverse=True)
+            values = np.bincount(positions, weights.to_numpy(dtype=float), minlength=len(columns))
+            sectors = {self._sector_column(sector): float(weight) for sector, weight in (sector_weightings or {}).items()}
+
+            row = self._row(ticker_symbol)
+            previous = self._holdings.get(row)
+            if (previous is not None and np.array_equal(previous[0], columns) and np.array_equal(previous[1], values)
+                    and self._sector_weights.get(row) == sectors):
+                return False
+            self._holdings[row] = (columns, values)
+            self._sector_weights[row] = sectors
+            self._dirty.add(row)
+            return True
+
+    def _triplets(self):
+        '''(rows, security columns, weights) of every holding, the sparse ETF x security matrix'''
+        rows = [np.full(len(columns), row, dtype=np.int64) for row, (columns, _) in self._holdings.items()]
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return (np.concatenate(rows), np.concatenate([columns for columns, _ in self._holdings.values()]),
+                np.concatenate([values for _, values in self._holdings.values()]))
+
+    def _build(self):
+        '''every pair of funds holding the same security, joined one chunk of securities at a time'''
+        n = len(self.tickers)
+        rows, columns, weights = self._triplets()
+        order = np.argsort(columns, kind="stable")
+        rows, columns, weights = rows[order], columns[order], weights[order]
+        overlap, dot = np.zeros(n * n), np.zeros(n * n)
+        _, starts, counts = np.unique(columns, return_index=True, return_counts=True)
+        # securities are cut in chunks of about PAIRS_PER_CHUNK pairs (a security held by k funds gives k * k pairs)
+        cumulative = np.cumsum(counts.astype(np.int64) ** 2)
+        targets = np.arange(1, (cumulative[-1] if len(counts) else 0) // PAIRS_PER_CHUNK + 1) * PAIRS_PER_CHUNK
+        cuts = np.searchsorted(cumulative, targets, side="right")
+        bounds = np.unique(np.concatenate([[0], cuts, [len(counts)]]).astype(np.int64))
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            group_starts, group_counts = starts[first:last], counts[first:last]
+            entries = np.arange(group_starts[0], group_starts[-1] + group_counts[-1])
+            # each entry is paired with every entry of its security (itself included)
+            per_entry = np.repeat(group_counts, group_counts)
+            left = np.repeat(entries, per_entry)
+            offsets = np.arange(len(left)) - np.repeat(np.cumsum(per_entry) - per_entry, per_entry)
+            right = np.repeat(np.repeat(group_starts, group_counts), per_entry) + offsets
+            cells = rows[left] * n + rows[right]
+            overlap += np.bincount(cells, np.minimum(weights[left], weights[right]), minlength=n * n)
+            dot += np.bincount(cells, weights[left] * weights[right], minlength=n * n)
+        self._overlap, self._dot = overlap.reshape(n, n), dot.reshape(n, n)
+        self._built = True
+        self._dirty.clear()
+        self.full_builds += 1
+
+    def _update_rows(self, changed):
+        '''recomputes the row and column of each changed fund against the whole universe'''
+        n = len(self.tickers)
+        if self._overlap.shape[0] < n:  # new funds: grow the matrices
+            grow = n - self._overlap.shape[0]
+            self._overlap = np.pad(self._overlap, ((0, grow), (0, grow)))
+            self._dot = np.pad(self._dot, ((0, grow), (0, grow)))
+        rows, columns, weights = self._triplets()
+        for row in changed:
+            own_columns, own_weights = self._holdings[row]
+            dense = np.zeros(len(self.securities))
+            dense[own_columns] = own_weights
+            common = dense[columns] > 0
+            overlap = np.bincount(rows[common], np.minimum(weights[common], dense[columns[common]]), minlength=n)
+            dot = np.bincount(rows[common], weights[common] * dense[columns[common]], minlength=n)
+            self._overlap[row, :] = self._overlap[:, row] = overlap
+            self._dot[row, :] = self._dot[:, row] = dot
+            self.row_updates += 1
+        self._dirty.clear()
+
+    def _refresh(self):
+        if not self._built or len(self._dirty) > max(1, REBUILD_FRACTION * len(self.tickers)):
+            self._build()
+        elif self._dirty:
+            self._update_rows(sorted(self._dirty))
+
+    def overlap_matrix(self):
+        '''DataFrame of the weight each pair of funds has in common (the diagonal is each fund's covered weight)'''
+        with self._lock:
+            self._refresh()
+            return pd.DataFrame(self._overlap.copy(), index=self.tickers, columns=self.tickers)
+
+    def similarity_matrix(self):
+        '''DataFrame of the cosine similarity of the holding weights of each pair of funds'''
+        with self._lock:
+            self._refresh()
+            norms = np.sqrt(np.diag(self._dot))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                similarity = np.nan_to_num(self._dot / np.outer(norms, norms))
+            return pd.DataFrame(similarity, index=self.tickers, columns=self.tickers)
+
+    def sector_matrix(self):
+        '''dense DataFrame ETF x sector of the sector weights'''
+        with self._lock:
+            matrix = np.zeros((len(self.tickers), len(self.sectors)))
+            for row, sectors in self._sector_weights.items():
+                matrix[row, list(sectors)] = list(sectors.values())
+            return pd.DataFrame(matrix, index=self.tickers, columns=self.sectors)
+
+    def basket_exposure(self, basket):
+        '''look-through weights of a basket (dict ticker -> weight of the fund in the basket);
+        returns a dictionary with the securities and sectors exposures, largest first'''
+        with self._lock:
+            missing = [ticker for ticker in basket if ticker not in self._rows]
+            if missing:
+                return {"error": f"No holdings loaded for {', '.join(missing)}."}
+            fund_weights = np.zeros(len(self.tickers))
+            for ticker, weight in basket.items():
+                fund_weights[self._rows[ticker]] = weight
+            rows, columns, weights = self._triplets()
+            securities = np.bincount(columns, weights * fund_weights[rows], minlength=len(self.securities))
+            sectors = fund_weights @ self.sector_matrix().to_numpy()
+            securities = pd.Series(securities, index=self.securities, name="Exposure")
+            return {
+                "securities": securities[securities > 0].sort_values(ascending=False),
+                "sectors": pd.Series(sectors, index=self.sectors, name="Exposure").sort_values(ascending=False),
+            }
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._holdings), "securities": len(self.securities),
+                    "full_builds": self.full_builds, "row_updates": self.row_updates}
+
+
+overlap_engine = OverlapEngine()
+register_cache("overlap", overlap_engine.stats)
+
+
+def load_universe(ticker_symbols, engine=overlap_engine, price_cache=None):
+    '''fetches the holdings and sectors of every ticker in parallel into engine; returns the tickers that failed'''
+    price_cache = price_cache if price_cache is not None else get_price_cache()
+    ticker_symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in ticker_symbols))
+
+    def fetch(ticker_symbol):
+        try:
+            funds = get_snapshot(ticker_symbol, price_cache).funds_data
+            engine.update(ticker_symbol, funds.top_holdings, funds.sector_weightings)
+            return None
+        except Exception as e:
+            record_error("load_universe", e)
+            return ticker_symbol
+
+    return [failed for failed in fetch_executor.map(fetch, ticker_symbols) if failed is not None]
+
+
+def _parse_basket(items):
+    basket = {}
+    for item in items:
+        ticker, _, weight = item.partition("=")
+        basket[ticker.strip().upper()] = float(weight or 1)
+    total = sum(basket.values())
+    return {ticker: weight / total for ticker, weight in basket.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Holdings overlap and look-through exposure of many ETFs.")
+    parser.add_argument("tickers", nargs="*", help="ticker symbols")
+    parser.add_argument("--tickers-file", help="file with one ticker symbol per line")
+    parser.add_argument("--basket", nargs="+", help="basket as TICKER=WEIGHT, prints its look-through exposure")
+    parser.add_argument("--output", help="write the overlap matrix to this CSV file")
+    parser.add_argument("--top", type=int, default=10, help="most overlapping pairs (and basket positions) printed")
+    parser.add_argument("--provider", choices=["yfinance", "fake"], default="yfinance",
+                        help="data source, 'fake' generates deterministic offline data")
+    parser.add_argument("--holdings", type=int, default=100, help="holdings per fund of the fake provider")
+    args = parser.parse_args(argv)
+
+    ticker_symbols = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file) as file:
+            ticker_symbols += [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    ticker_symbols += [item.partition("=")[0] for item in args.basket or []]
+    if not ticker_symbols:
+        parser.error("no tickers given")
+    if args.provider == "fake":
+        set_provider(FakeProvider(holdings=args.holdings))
+
+    start = time.perf_counter()
+    failed = load_universe(ticker_symbols)
+    loaded = time.perf_counter()
+    overlap = overlap_engine.overlap_matrix()
+    similarity = overlap_engine.similarity_matrix()
+    print(f"{len(overlap)} funds, {len(overlap_engine.securities)} securities: holdings loaded in {loaded - start:.1f}s, "
+          f"matrices computed in {time.perf_counter() - loaded:.2f}s", file=sys.stderr)
+    if failed:
+        print(f"no holdings for {', '.join(failed)}", file=sys.stderr)
+
+    pairs = overlap.where(np.triu(np.ones(overlap.shape, dtype=bool), k=1)).stack().dropna().sort_values(ascending=False)
+    for (first, second), value in pairs.head(args.top).items():
+        print(f"{first:>8s} {second:<8s} overlap {value:7.2%}  similarity {similarity.loc[first, second]:.2f}")
+    if args.basket:
+        exposure = overlap_engine.basket_exposure(_parse_basket(args.basket))
+        if "error" in exposure:
+            print(exposure["error"], file=sys.stderr)
+        else:
+            print(exposure["securities"].head(args.top).to_string())
+            print(exposure["sectors"].to_string())
+    if args.output:
+        overlap.to_csv(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from providers import YFinanceProvider
+
+#####-----PERSISTENT PRICE HISTORY CACHE-----#################################################################################################################################
+
+# Parquet (columnar) when pyarrow is installed, pickle otherwise; pandas imports pyarrow with the first read or write
+CACHE_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") is not None else "pickle"
+
+DEFAULT_CACHE_DIR = os.environ.get("ETF_CACHE_DIR", ".price_cache")
+
+
+def normalize_history(prices):
+    '''daily bars indexed by plain (timezone free, nanosecond) dates, whatever the provider returned'''
+    index = pd.DatetimeIndex(prices.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)  # keeps the exchange's local date
+    prices = prices.copy()
+    prices.index = index.normalize().as_unit("ns").rename("Date")
+    return prices
+
+
+class PriceCache:
+    '''On-disk store of daily price history keyed by ticker, refreshed incrementally from a provider'''
+
+    def __init__(self, provider=None, cache_dir=DEFAULT_CACHE_DIR, refresh_interval=3600, max_memory=64):
+        self.provider = provider if provider is not None else YFinanceProvider()
+        self.cache_dir = cache_dir
+        self.refresh_interval = refresh_interval  # seconds before a stored history is checked for new bars
+        self.max_memory = max_memory  # histories kept in memory (least recently used dropped first, disk keeps them)
+        self._memory = OrderedDict()  # ticker -> (history, time of the last refresh)
+        self._memory_lock = threading.Lock()
+        self.hits = 0  # histories served without asking the provider
+        self.misses = 0  # histories downloaded or refreshed
+        self._locks = {}  # one lock per ticker, so concurrent lookups of a ticker trigger a single fetch
+        self._locks_lock = threading.Lock()
+
+    def _ticker_lock(self, ticker_symbol):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker_symbol, threading.Lock())
+
+    def _path(self, ticker_symbol):
+        extension = "parquet" if CACHE_FORMAT == "parquet" else "pkl"
+        return os.path.join(self.cache_dir, f"{ticker_symbol.upper()}.{extension}")
+
+    def _remember(self, ticker_symbol, prices, refreshed_at):
+        with self._memory_lock:
+            self._memory[ticker_symbol] = (prices, refreshed_at)
+            self._memory.move_to_end(ticker_symbol)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+
+    def _load(self, ticker_symbol):
+        '''returns (history, refresh time) from memory or disk, (None, 0) if the ticker was never stored'''
+        with self._memory_lock:
+            if ticker_symbol in self._memory:
+                self._memory.move_to_end(ticker_symbol)
+                return self._memory[ticker_symbol]
+        path = self._path(ticker_symbol)
+        if not os.path.exists(path):
+            return None, 0
+        if CACHE_FORMAT == "parquet":
+            prices = pd.read_parquet(path)
+        else:
+            prices = pd.read_pickle(path)
+        return normalize_history(prices), os.path.getmtime(path)
+
+    def _store(self, ticker_symbol, prices):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(ticker_symbol)
+        tmp_path = path + ".tmp"
+        if CACHE_FORMAT == "parquet":
+            prices.to_parquet(tmp_path)
+        else:
+            prices.to_pickle(tmp_path)
+        os.replace(tmp_path, path)  # atomic, so a crash never leaves a half written file
+        self._remember(ticker_symbol, prices, time.time())
+
+    def get_history(self, ticker_symbol):
+        '''returns the full daily history of ticker_symbol, fetching only the bars after the last cached date'''
+        ticker_symbol = ticker_symbol.strip().upper()
+        with self._ticker_lock(ticker_symbol):
+            return self._get_history(ticker_symbol).copy()
+
+    def _get_history(self, ticker_symbol):
+        cached, refreshed_at = self._load(ticker_symbol)
+
+        if cached is None or cached.empty:
+            self.misses += 1
+            return self._store_new(ticker_symbol, self.provider.history(ticker_symbol))
+
+        if time.time() - refreshed_at < self.refresh_interval:
+            self.hits += 1
+            self._remember(ticker_symbol, cached, refreshed_at)
+            return cached
+
+        self.misses += 1
+        new_bars = self.provider.history(ticker_symbol, start=self._refresh_start(cached))
+        if self._readjusted(cached, new_bars):
+            return self._store_new(ticker_symbol, self.provider.history(ticker_symbol))
+        return self._append(ticker_symbol, cached, new_bars)
+
+    @staticmethod
+    def _refresh_start(cached):
+        '''the last two cached bars are fetched again: the last one may have been stored before the close,
+        the one before it is a closed bar showing whether the provider adjusted the past since'''
+        return cached.index[-min(len(cached), 2)].date()
+
+    @staticmethod
+    def _readjusted(cached, new_bars):
+        '''True when the re-fetched closed bar no longer matches the cached one: the provider adjusted the whole
+        history for a dividend or split, so appending to the cached prefix would leave a step in the series'''
+        if len(cached) < 2 or new_bars.empty:
+            return False
+        overlap = normalize_history(new_bars[["Close"]])["Close"]
+        checked = cached.index[-2]
+        if checked not in overlap.index:
+            return False
+        return not np.isclose(overlap.loc[checked], cached["Close"].iloc[-2], rtol=1e-6, atol=0.0)
+
+    def _store_new(self, ticker_symbol, prices):
+        if prices.empty:
+            return prices
+        prices = normalize_history(prices)
+        self._store(ticker_symbol, prices)
+        return prices
+
+    def _append(self, ticker_symbol, cached, new_bars):
+        if new_bars.empty:
+            prices = cached
+        else:
+            prices = pd.concat([cached, normalize_history(new_bars)])
+            prices = prices[~prices.index.duplicated(keep="last")].sort_index()
+        self._store(ticker_symbol, prices)
+        return prices
+
+    def get_many(self, ticker_symbols):
+        '''returns a dictionary ticker -> full history. Tickers missing from the cache are downloaded together,
+        stale ones are refreshed together from the oldest last cached date, when the provider supports batches'''
+        ticker_symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in ticker_symbols))
+        histories, missing, stale = {}, [], {}
+        for ticker_symbol in ticker_symbols:
+            cached, refreshed_at = self._load(ticker_symbol)
+            if cached is None or cached.empty:
+                missing.append(ticker_symbol)
+            elif time.time() - refreshed_at >= self.refresh_interval:
+                stale[ticker_symbol] = cached
+            else:
+                self._remember(ticker_symbol, cached, refreshed_at)
+                histories[ticker_symbol] = cached
+        if missing:
+            for ticker_symbol, prices in self.provider.history_many(missing).items():
+                with self._ticker_lock(ticker_symbol):
+                    histories[ticker_symbol] = self._store_new(ticker_symbol, prices)
+        if stale:
+            start = min(self._refresh_start(cached) for cached in stale.values())
+            readjusted = []
+            for ticker_symbol, new_bars in self.provider.history_many(list(stale), start=start).items():
+                if self._readjusted(stale[ticker_symbol], new_bars):
+                    readjusted.append(ticker_symbol)
+                    continue
+                with self._ticker_lock(ticker_symbol):
+                    histories[ticker_symbol] = self._append(ticker_symbol, stale[ticker_symbol], new_bars)
+            if readjusted:  # adjusted upstream since they were cached: downloaded again in full
+                for ticker_symbol, prices in self.provider.history_many(readjusted).items():
+                    with self._ticker_lock(ticker_symbol):
+                        histories[ticker_symbol] = self._store_new(ticker_symbol, prices)
+        return {ticker_symbol: histories[ticker_symbol].copy() for ticker_symbol in ticker_symbols if ticker_symbol in histories}
+
+    def stats(self):
+        with self._memory_lock:
+            return {"entries": len(self._memory), "hits": self.hits, "misses": self.misses}
+
+    def clear(self, ticker_symbol=None):
+        '''removes one ticker (or every ticker) from memory and disk'''
+        with self._memory_lock:
+            tickers = [ticker_symbol.upper()] if ticker_symbol else list(self._memory)
+        if ticker_symbol is None and os.path.isdir(self.cache_dir):
+            tickers += [name.rsplit(".", 1)[0] for name in os.listdir(self.cache_dir)]
+        for symbol in set(tickers):
+            with self._memory_lock:
+                self._memory.pop(symbol, None)
+            if os.path.exists(self._path(symbol)):
+                os.remove(self._path(symbol))
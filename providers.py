@@ -0,0 +1,265 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from metrics import record_error
+
+#####-----DATA PROVIDERS-----#################################################################################################################################
+
+# Every provider returns daily OHLCV bars indexed by a "Date" DatetimeIndex, like yf.Ticker(...).history()
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+# Yahoo Finance endpoint answering the quotes of many symbols at once (the one behind part of yf.Ticker(...).info)
+YAHOO_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+
+
+class PriceProvider:
+    '''Interface for market data sources, so the dashboard can run against yfinance or an offline fake'''
+
+    def history(self, ticker_symbol, start=None):
+        '''returns the daily bars of ticker_symbol from start (inclusive), or the full history if start is None'''
+        raise NotImplementedError
+
+    def history_many(self, ticker_symbols, start=None):
+        '''returns a dictionary ticker -> daily bars; providers able to download several tickers at once override it'''
+        return {ticker_symbol: self.history(ticker_symbol, start) for ticker_symbol in ticker_symbols}
+
+    def history_1d(self, ticker_symbol):
+        '''returns the bars of the last trading day (current price and volume)'''
+        raise NotImplementedError
+
+    def info(self, ticker_symbol):
+        '''returns the metadata dictionary of ticker_symbol (names, bid/ask, assets, yield, ...)'''
+        raise NotImplementedError
+
+    def quotes(self, ticker_symbols):
+        '''returns a dictionary ticker -> latest quote (bid, ask, currency, volume); providers able to batch override it'''
+        return {ticker_symbol: make_quote(self.info(ticker_symbol), self.history_1d(ticker_symbol)) for ticker_symbol in ticker_symbols}
+
+    def news(self, ticker_symbol):
+        '''returns the list of news items (dictionaries with title, publisher, link)'''
+        raise NotImplementedError
+
+    def funds_data(self, ticker_symbol):
+        '''returns an object with top_holdings (DataFrame indexed by Symbol) and sector_weightings (dict)'''
+        raise NotImplementedError
+
+
+class YFinanceProvider(PriceProvider):
+    '''Market data fetched from Yahoo Finance through yfinance'''
+
+    @property
+    def yf(self):
+        # imported on the first request: yfinance is slow to import and not needed to start the server
+        import yfinance
+        return yfinance
+
+    def history(self, ticker_symbol, start=None):
+        ticker = self.yf.Ticker(ticker_symbol)
+        if start is None:
+            return ticker.history(period="max")
+        return ticker.history(start=start)
+
+    def history_many(self, ticker_symbols, start=None):
+        '''downloads every ticker in one request'''
+        if len(ticker_symbols) < 2:
+            return super().history_many(ticker_symbols, start)
+        period = {"period": "max"} if start is None else {"start": start}
+        data = self.yf.download(list(ticker_symbols), group_by="ticker", auto_adjust=True, actions=True,
+                           threads=True, progress=False, **period)
+        histories = {}
+        for ticker_symbol in ticker_symbols:
+            if ticker_symbol in data.columns.get_level_values(0):
+                histories[ticker_symbol] = data[ticker_symbol].dropna(how="all")
+            else:
+                histories[ticker_symbol] = pd.DataFrame(columns=PRICE_COLUMNS)
+        return histories
+
+    def history_1d(self, ticker_symbol):
+        return self.yf.Ticker(ticker_symbol).history(period="1d")
+
+    def info(self, ticker_symbol):
+        return self.yf.Ticker(ticker_symbol).info
+
+    def quotes(self, ticker_symbols):
+        '''bid, ask, currency and volume of every ticker in one request to Yahoo's quote endpoint, or one info and
+        history_1d request per ticker when that endpoint (not a public yfinance API) fails'''
+        try:
+            from yfinance.data import YfData  # yfinance's shared session (cookie and crumb), as used by Ticker.info
+            result = YfData().get_raw_json(YAHOO_QUOTE_URL, params={"symbols": ",".join(ticker_symbols), "formatted": "false"})
+            rows = {row.get("symbol"): row for row in (result.get("quoteResponse") or {}).get("result") or []}
+        except Exception as e:
+            record_error("batched quotes", e)
+            return super().quotes(ticker_symbols)
+        quotes = {}
+        for ticker_symbol in ticker_symbols:
+            row = rows.get(ticker_symbol, {})
+            quotes[ticker_symbol] = {
+                "bid": row.get("bid"),
+                "ask": row.get("ask"),
+                "currency": row.get("currency", "Unknown"),
+                "volume": row.get("regularMarketVolume", "N/A"),
+            }
+        return quotes
+
+    def news(self, ticker_symbol):
+        return self.yf.Ticker(ticker_symbol).get_news()
+
+    def funds_data(self, ticker_symbol):
+        return self.yf.Ticker(ticker_symbol).funds_data
+
+
+class FakeFundsData:
+    '''Holdings and sector weights shaped like yfinance's FundsData (synthetic, or read from a recording)'''
+
+    def __init__(self, top_holdings, sector_weightings):
+        self.top_holdings = top_holdings
+        self.sector_weightings = sector_weightings
+
+
+class FakeProvider(PriceProvider):
+    '''Deterministic synthetic provider (random walk seeded by the ticker), used to work offline'''
+
+    SECTORS = ["technology", "financial_services", "healthcare", "consumer_cyclical", "industrials",
+               "communication_services", "consumer_defensive", "energy", "basic_materials", "realestate", "utilities"]
+
+    def __init__(self, years=30, end="2024-12-31", seed=0, holdings=10, news_items=8):
+        self.years = years
+        self.holdings = holdings  # size of top_holdings (yfinance returns the top 10)
+        self.news_items = news_items
+        self.end = pd.Timestamp(end)
+        self.start = self.end - pd.DateOffset(years=years)  # fixed, so moving end only appends new bars
+        self.seed = seed
+        self.calls = []  # (method, ticker_symbol, start) of every request, to check how often the "network" is hit
+        self._calendar = (None, None)
+        self._quote_calls = 0
+
+    def _dates(self):
+        '''business days of the synthetic history, built once per end date'''
+        if self._calendar[0] != self.end:
+            dates = pd.bdate_range(self.start, self.end, name="Date").tz_localize("America/New_York")
+            self._calendar = (self.end, dates)
+        return self._calendar[1]
+
+    def _rng(self, ticker_symbol, salt=""):
+        return np.random.default_rng(zlib.crc32((ticker_symbol + salt).encode()) ^ self.seed)
+
+    def full_history(self, ticker_symbol):
+        '''builds the whole synthetic history of a ticker, always identical for the same ticker and seed'''
+        dates = self._dates()
+        rng = self._rng(ticker_symbol)
+        log_returns = rng.normal(0.07 / 252, 0.18 / np.sqrt(252), len(dates))
+        close = 100 * np.exp(np.cumsum(log_returns))
+        # one random stream per column, so moving the end date only appends bars and never changes the past ones
+        spread = np.abs(self._rng(ticker_symbol, "spread").normal(0, 0.005, len(dates)))
+        return pd.DataFrame({
+            "Open": close * (1 + self._rng(ticker_symbol, "open").normal(0, 0.002, len(dates))),
+            "High": close * (1 + spread),
+            "Low": close * (1 - spread),
+            "Close": close,
+            "Volume": self._rng(ticker_symbol, "volume").integers(1_000_000, 50_000_000, len(dates)),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        }, index=dates)
+
+    def history(self, ticker_symbol, start=None):
+        self.calls.append(("history", ticker_symbol, start))
+        prices = self.full_history(ticker_symbol)
+        if start is not None:
+            prices = prices[prices.index >= _as_index_time(start, prices.index)]
+        return prices
+
+    def history_many(self, ticker_symbols, start=None):
+        self.calls.append(("history_many", tuple(ticker_symbols), start))
+        histories = {}
+        for ticker_symbol in ticker_symbols:
+            prices = self.full_history(ticker_symbol)
+            if start is not None:
+                prices = prices[prices.index >= _as_index_time(start, prices.index)]
+            histories[ticker_symbol] = prices
+        return histories
+
+    def history_1d(self, ticker_symbol):
+        self.calls.append(("history_1d", ticker_symbol, None))
+        return self.full_history(ticker_symbol).iloc[-1:]
+
+    def info(self, ticker_symbol):
+        self.calls.append(("info", ticker_symbol, None))
+        rng = self._rng(ticker_symbol, "info")
+        close = self.full_history(ticker_symbol)["Close"]
+        last = close.iloc[-1]
+        half_spread = last * rng.uniform(0.0001, 0.001)
+        year_start = close[close.index.year == close.index[-1].year].iloc[0]
+        return {
+            "longName": f"{ticker_symbol} Synthetic ETF",
+            "shortName": ticker_symbol,
+            "currency": "USD",
+            "bid": round(last - half_spread, 2),
+            "ask": round(last + half_spread, 2),
+            "totalAssets": float(rng.uniform(1e8, 5e11)),
+            "ytdReturn": float(last / year_start - 1),
+            "yield": float(rng.uniform(0, 0.04)),
+            "longBusinessSummary": f"The fund seeks to track a synthetic index ({ticker_symbol}) generated for offline use.",
+        }
+
+    def quotes(self, ticker_symbols):
+        '''quotes moving a little around the last close at every call (deterministic for a given number of calls)'''
+        self.calls.append(("quotes", tuple(ticker_symbols), None))
+        self._quote_calls += 1
+        quotes = {}
+        for ticker_symbol in ticker_symbols:
+            last_bar = self.full_history(ticker_symbol).iloc[-1]
+            rng = self._rng(ticker_symbol, f"quote{self._quote_calls}")
+            mid = last_bar["Close"] * (1 + rng.normal(0, 0.001))
+            half_spread = mid * rng.uniform(0.0001, 0.001)
+            quotes[ticker_symbol] = {
+                "bid": round(mid - half_spread, 2),
+                "ask": round(mid + half_spread, 2),
+                "currency": "USD",
+                "volume": int(last_bar["Volume"]) + self._quote_calls * int(rng.integers(0, 10_000)),
+            }
+        return quotes
+
+    def news(self, ticker_symbol):
+        self.calls.append(("news", ticker_symbol, None))
+        return [
+            {"title": f"{ticker_symbol} headline {i + 1}", "publisher": "Synthetic Wire",
+             "link": f"https://example.com/{ticker_symbol.lower()}/{i + 1}"}
+            for i in range(self.news_items)
+        ]
+
+    def funds_data(self, ticker_symbol):
+        self.calls.append(("funds_data", ticker_symbol, None))
+        holdings = self.holdings
+        rng = self._rng(ticker_symbol, "holdings")
+        weights = np.sort(rng.pareto(1.5, holdings) + 1)[::-1]
+        weights = weights / weights.sum() * rng.uniform(0.2, 0.6)  # top holdings cover part of the fund
+        symbols = [f"S{number:06d}" for number in rng.choice(max(20_000, 2 * holdings), holdings, replace=False)]
+        top_holdings = pd.DataFrame({
+            "Symbol": symbols,
+            "Name": [f"Company {symbol}" for symbol in symbols],
+            "Holding Percent": weights,
+        }).set_index("Symbol")
+        sector_weights = rng.dirichlet(np.ones(len(self.SECTORS)))
+        return FakeFundsData(top_holdings, dict(zip(self.SECTORS, sector_weights.tolist())))
+
+
+def make_quote(info, history_1d):
+    '''quote dictionary (bid, ask, currency, volume) from the info and last-day bars of a ticker'''
+    return {
+        "bid": info.get("bid", None),
+        "ask": info.get("ask", None),
+        "currency": info.get("currency", "Unknown"),
+        "volume": history_1d["Volume"].iloc[-1] if not history_1d.empty else "N/A",
+    }
+
+
+def _as_index_time(value, index):
+    '''converts value to a Timestamp comparable with index (same timezone)'''
+    value = pd.Timestamp(value)
+    if index.tz is not None and value.tz is None:
+        return value.tz_localize(index.tz)
+    if index.tz is not None:
+        return value.tz_convert(index.tz)
+    return value.tz_localize(None) if value.tz is not None else value
@@ -0,0 +1,139 @@
+import threading
+
+from metrics import logger, record_error, register_cache, timed
+from shared_cache import get_price_cache
+
+#####-----SHARED LIVE-QUOTE POLLER-----#################################################################################################################################
+# One background thread asks the provider for the quotes of every ticker watched by any session in a single call per
+# interval; sessions read the latest quote from a periodic callback and only re-render when its version changed.
+
+POLL_INTERVAL = 5  # seconds between two upstream quote requests
+SESSION_REFRESH = 1000  # milliseconds between two checks of a session for a new quote
+
+
+class QuotePoller:
+    '''Process-wide poller of the quotes (bid, ask, currency, volume) of the watched tickers. The upstream request
+    volume depends on the number of distinct tickers and the interval, not on the number of sessions.'''
+
+    def __init__(self, source=None, interval=POLL_INTERVAL):
+        # source(ticker_symbols) -> {ticker: quote}, by default the quotes() of the shared provider
+        self.source = source if source is not None else (lambda ticker_symbols: get_price_cache().provider.quotes(ticker_symbols))
+        self.interval = interval
+        self._watchers = {}  # ticker -> number of sessions watching it
+        self._quotes = {}  # ticker -> (version, quote), the version only changes when the quote changes
+        self._lock = threading.Lock()
+        self._wake = threading.Event()  # set to poll at once (a new ticker is watched, or the poller stops)
+        self._stopped = threading.Event()  # stop flag of the current thread (each thread gets its own)
+        self._thread = None
+        self.polls = 0
+        self.changes = 0
+
+    def watch(self, ticker_symbol):
+        '''starts polling ticker_symbol for one more session (and the poller thread if needed)'''
+        with self._lock:
+            count = self._watchers.get(ticker_symbol, 0)
+            self._watchers[ticker_symbol] = count + 1
+            # a stopped thread may still be finishing its last poll: it keeps its own flag and a new thread starts
+            if self._thread is None or not self._thread.is_alive() or self._stopped.is_set():
+                self._stopped = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stopped,), name="quote-poller", daemon=True)
+                self._thread.start()
+        if count == 0 and ticker_symbol not in self._quotes:
+            self._wake.set()
+
+    def unwatch(self, ticker_symbol):
+        '''one session less watches ticker_symbol; it is dropped from the requests when nobody watches it'''
+        with self._lock:
+            count = self._watchers.get(ticker_symbol, 0) - 1
+            if count > 0:
+                self._watchers[ticker_symbol] = count
+            else:
+                self._watchers.pop(ticker_symbol, None)
+                self._quotes.pop(ticker_symbol, None)
+
+    def latest(self, ticker_symbol):
+        '''returns (version, quote) of ticker_symbol, (0, None) before its first quote arrived'''
+        with self._lock:
+            return self._quotes.get(ticker_symbol, (0, None))
+
+    def poll_once(self):
+        '''requests the quotes of every watched ticker in one call; returns the tickers whose quote changed'''
+        with self._lock:
+            ticker_symbols = sorted(self._watchers)
+        if not ticker_symbols:
+            return []
+        try:
+            with timed("etf_quotes_poll"):
+                quotes = self.source(ticker_symbols)
+        except Exception as e:
+            record_error("quote poller", e)
+            return []
+        changed = []
+        with self._lock:
+            self.polls += 1
+            for ticker_symbol, quote in quotes.items():
+                if ticker_symbol not in self._watchers:
+                    continue
+                version, previous = self._quotes.get(ticker_symbol, (0, None))
+                if quote != previous:
+                    self._quotes[ticker_symbol] = (version + 1, quote)
+                    changed.append(ticker_symbol)
+            self.changes += len(changed)
+        return changed
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                logger.exception("quote poller failed")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stop(self, timeout=None):
+        '''stops the polling thread and waits for it to finish'''
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped.set()
+        self._wake.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._watchers), "polls": self.polls, "changes": self.changes}
+
+
+quote_poller = QuotePoller()
+register_cache("live_quotes", quote_poller.stats)
+
+
+class QuoteSubscription:
+    '''Live quote of one session: follows a ticker of the poller and calls render(quote) only when the quote changed'''
+
+    def __init__(self, render, poller=quote_poller):
+        self.render = render
+        self.poller = poller
+        self.ticker_symbol = None
+        self._version = 0
+
+    def follow(self, ticker_symbol):
+        '''switches to ticker_symbol (None stops following)'''
+        if ticker_symbol == self.ticker_symbol:
+            return
+        if self.ticker_symbol is not None:
+            self.poller.unwatch(self.ticker_symbol)
+        self.ticker_symbol, self._version = ticker_symbol, 0
+        if ticker_symbol is not None:
+            self.poller.watch(ticker_symbol)
+
+    def refresh(self):
+        '''renders the latest quote if it is newer than the one shown; returns True when it rendered'''
+        if self.ticker_symbol is None:
+            return False
+        version, quote = self.poller.latest(self.ticker_symbol)
+        if version == self._version:
+            return False
+        self._version = version
+        self.render(quote)
+        return True
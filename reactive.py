@@ -0,0 +1,87 @@
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import panel as pn
+
+from shared_cache import fetch_executor, in_fetch_pool
+
+#####-----DEBOUNCED AND SHARED RECOMPUTATION FOR BOUND WIDGETS-----#################################################################################################################################
+# Views bound with pn.bind are async: Panel cancels the pending evaluation of a view when its widgets change again,
+# so a view that starts with `await debounce()` only computes once the widgets stopped moving, and a view waiting
+# for a SharedComputation of stale parameters is dropped instead of being drawn.
+
+DEBOUNCE_SECONDS = 0.25
+
+
+def _live_session():
+    return pn.state.curdoc is not None and pn.state.curdoc.session_context is not None
+
+
+async def debounce(delay=DEBOUNCE_SECONDS):
+    '''waits delay seconds in a live session (a newer widget change cancels the wait), returns at once elsewhere'''
+    if _live_session():
+        await asyncio.sleep(delay)
+
+
+def debounced(function):
+    '''decorator of an async view calling debounce() before it, so timing decorators below it leave the wait out'''
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        await debounce()
+        return await function(*args, **kwargs)
+    return wrapper
+
+
+class SharedComputation:
+    '''Computes function once per parameter set for every view depending on it: the last maxsize results are kept
+    and concurrent requests of the same parameters wait for a single computation.'''
+
+    def __init__(self, function, maxsize=8, executor=fetch_executor):
+        self.function = function
+        self.maxsize = maxsize
+        self.executor = executor
+        self.computations = 0  # number of times function actually ran
+        self._results = OrderedDict()  # args -> Future, finished or in flight
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        '''returns function(*args), blocking until it is computed'''
+        with self._lock:
+            future = self._results.get(args)
+            owner = future is None
+            if owner:
+                future = self._results[args] = Future()
+                self.computations += 1
+            self._results.move_to_end(args)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        if owner:
+            try:
+                future.set_result(self.function(*args))
+            except Exception as e:
+                future.set_exception(e)
+                with self._lock:  # errors are not kept, the next request tries again
+                    if self._results.get(args) is future:
+                        del self._results[args]
+        return future.result()
+
+    async def get(self, *args):
+        '''returns function(*args) computed in the thread pool, without blocking the server'''
+        if in_fetch_pool():  # already in a pool thread: waiting for a task queued behind busy workers could starve it
+            return self(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self, *args)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+def evaluate(view):
+    '''calls a bound view outside the server (scripts, benchmarks, load tests) and waits for its result'''
+    result = view()
+    if asyncio.iscoroutine(result):
+        return asyncio.run(result)
+    return result
@@ -0,0 +1,127 @@
+import os
+import pickle
+import threading
+import time
+
+import pandas as pd
+
+from metrics import logger, record_error
+from providers import PRICE_COLUMNS, FakeFundsData, PriceProvider
+
+#####-----RECORD / REPLAY OF UPSTREAM ANSWERS-----#################################################################################################################################
+
+DEFAULT_RECORD_DIR = os.environ.get("ETF_RECORD_DIR", ".recordings")
+# ETF_REPLAY=1 serves every field from the recordings only, without any network request
+REPLAY = os.environ.get("ETF_REPLAY", "") not in ("", "0")
+
+# seconds a recorded answer is served before it is fetched again: quotes in seconds, news in minutes, holdings in days
+RECORD_TTLS = {
+    "history_1d": 60,
+    "info": 60,  # holds the bid/ask quotes
+    "news": 15 * 60,
+    "funds_data": 3 * 24 * 3600,
+}
+
+
+class RecordingProvider(PriceProvider):
+    '''Provider recording the quotes, info, news and holdings of the wrapped provider on disk and answering from the
+    recordings while they are younger than their TTL. In replay mode only the recordings are used (offline demos and tests);
+    price history goes straight through, the PriceCache already keeps it on disk.'''
+
+    def __init__(self, provider=None, record_dir=DEFAULT_RECORD_DIR, ttls=None, replay=REPLAY, clock=time.time):
+        self.provider = provider
+        self.record_dir = record_dir
+        self.ttls = dict(RECORD_TTLS, **(ttls or {}))
+        self.replay = replay
+        self.clock = clock
+        self.hits = 0  # answers served from the recordings
+        self.misses = 0  # answers fetched upstream and recorded
+        self.stale = 0  # expired recordings served because the upstream request failed
+        self._lock = threading.Lock()
+
+    def _path(self, field, ticker_symbol):
+        return os.path.join(self.record_dir, field, f"{ticker_symbol.upper()}.pkl")
+
+    def _load(self, field, ticker_symbol):
+        '''returns (value, recording time), (None, None) if the field was never recorded'''
+        path = self._path(field, ticker_symbol)
+        if not os.path.exists(path):
+            return None, None
+        try:
+            with open(path, "rb") as file:
+                return pickle.load(file)
+        except Exception as e:  # unreadable recording: fetch it again
+            record_error("recording", e)
+            return None, None
+
+    def _save(self, field, ticker_symbol, value):
+        path = self._path(field, ticker_symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump((value, self.clock()), file)
+        os.replace(tmp_path, path)  # atomic, so a crash never leaves a half written file
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _recorded(self, field, ticker_symbol, fetch):
+        value, recorded_at = self._load(field, ticker_symbol)
+        if self.replay:
+            if recorded_at is None:
+                raise LookupError(f"{field} of {ticker_symbol} was not recorded.")
+            self._count("hits")
+            return value
+        if recorded_at is not None and self.clock() - recorded_at < self.ttls[field]:
+            self._count("hits")
+            return value
+        try:
+            value = fetch()
+        except Exception as e:
+            if recorded_at is None:
+                raise
+            logger.warning("%s of %s failed, serving the recording of %s: %s",
+                           field, ticker_symbol, time.ctime(recorded_at), e)
+            self._count("stale")
+            return value
+        self._count("misses")
+        self._save(field, ticker_symbol, value)
+        return value
+
+    def history(self, ticker_symbol, start=None):
+        if self.replay:
+            if start is None:
+                raise LookupError(f"history of {ticker_symbol} is not in the price cache.")
+            return pd.DataFrame(columns=PRICE_COLUMNS)  # no new bars offline
+        return self.provider.history(ticker_symbol, start)
+
+    def history_many(self, ticker_symbols, start=None):
+        if self.replay:
+            return super().history_many(ticker_symbols, start)
+        return self.provider.history_many(ticker_symbols, start)
+
+    def history_1d(self, ticker_symbol):
+        return self._recorded("history_1d", ticker_symbol, lambda: self.provider.history_1d(ticker_symbol))
+
+    def info(self, ticker_symbol):
+        return self._recorded("info", ticker_symbol, lambda: self.provider.info(ticker_symbol))
+
+    def quotes(self, ticker_symbols):
+        if self.replay:  # recorded quotes, from the recorded info and last-day bars
+            return super().quotes(ticker_symbols)
+        return self.provider.quotes(ticker_symbols)
+
+    def news(self, ticker_symbol):
+        return self._recorded("news", ticker_symbol, lambda: self.provider.news(ticker_symbol))
+
+    def funds_data(self, ticker_symbol):
+        def fetch():
+            # yfinance's FundsData downloads lazily and cannot be pickled: keep only the two tables the dashboard reads
+            funds = self.provider.funds_data(ticker_symbol)
+            return FakeFundsData(funds.top_holdings, funds.sector_weightings)
+        return self._recorded("funds_data", ticker_symbol, fetch)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "stale": self.stale}
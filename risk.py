@@ -0,0 +1,199 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from analytics import analytics_cache
+
+#####-----ROLLING RISK METRICS ENGINE-----#################################################################################################################################
+
+TRADING_DAYS = 252  # daily returns per year, to annualize and to turn years into a window length
+
+RISK_COLUMNS = ["Volatility", "Sharpe", "Sortino", "Beta", "Max Drawdown", "Drawdown", "Drawdown Duration"]
+
+
+class _MaxDrawdownWindow:
+    '''Sliding window of log prices answering the largest peak-to-trough fall inside the window in amortized O(1).
+    A queue made of two stacks, each entry carrying the (max, min, largest fall) of its part of the queue.'''
+
+    def __init__(self):
+        self._front = []  # oldest on top: (value, aggregate of this entry and the newer entries below it)
+        self._back = []  # newest on top: (value, aggregate of the back entries up to this one)
+
+    @staticmethod
+    def _combine(older, newer):
+        return (max(older[0], newer[0]), min(older[1], newer[1]), max(older[2], newer[2], older[0] - newer[1]))
+
+    def push(self, value):
+        single = (value, value, 0.0)
+        self._back.append((value, self._combine(self._back[-1][1], single) if self._back else single))
+
+    def pop(self):
+        if not self._front:
+            while self._back:
+                value, _ = self._back.pop()
+                single = (value, value, 0.0)
+                self._front.append((value, self._combine(single, self._front[-1][1]) if self._front else single))
+        self._front.pop()
+
+    def copy(self):
+        window = _MaxDrawdownWindow()
+        window._front, window._back = list(self._front), list(self._back)
+        return window
+
+    def largest_fall(self):
+        if not self._front:
+            return self._back[-1][1][2]
+        if not self._back:
+            return self._front[-1][1][2]
+        return self._combine(self._front[-1][1], self._back[-1][1])[2]
+
+
+class RollingRisk:
+    '''Volatility, Sharpe and Sortino ratios, beta against a benchmark, maximum drawdown, current drawdown and its
+    duration over a sliding window of `window` daily returns, for every day of a price history.
+    Moments come from prefix sums and the drawdowns from a monotonic deque and a two-stack queue, so the whole
+    history costs O(n), appending new bars only processes the new bars and a revised last bar only redoes that bar.'''
+
+    def __init__(self, close, window, benchmark=None, risk_free=0.0):
+        self.window = window
+        self.risk_free = risk_free  # yearly rate subtracted from the mean return in Sharpe and Sortino
+        self.has_benchmark = benchmark is not None
+        self._lock = threading.Lock()
+        self._reset()
+        self.update(close, benchmark)
+
+    def _reset(self):
+        self.dates = pd.DatetimeIndex([], name="Date")
+        self._close = np.empty(0)
+        self._benchmark = np.empty(0)
+        # prefix sums of r, r^2, min(r, 0)^2, b, b^2, r*b (r: log return of the ETF, b: of the benchmark)
+        self._sums = np.zeros((6, 1))
+        self._peaks = deque()  # positions of the decreasing prices of the window (the front is the window peak)
+        self._falls = _MaxDrawdownWindow()
+        self._checkpoint = None  # (peaks, falls) from before the last processed bar, to redo it when it is revised
+        self._results = np.empty((0, len(RISK_COLUMNS)))
+        self.rebuilds = getattr(self, "rebuilds", -1) + 1
+
+    @property
+    def nbytes(self):
+        return self._close.nbytes * 3 + self._sums.nbytes + self._results.nbytes
+
+    def _same_bar(self, index, values, benchmark, i):
+        '''whether bar i of the new history is the processed bar i'''
+        return (len(values) > i and index[i] == self.dates[i] and values[i] == self._close[i]
+                and benchmark[i] == self._benchmark[i])
+
+    def _rollback(self):
+        '''forgets the last processed bar, back to the state from before it was processed'''
+        n = len(self.dates) - 1
+        self.dates = self.dates[:n]
+        self._close, self._benchmark = self._close[:n], self._benchmark[:n]
+        self._sums = self._sums[:, :n + 1]
+        self._results = self._results[:n]
+        self._peaks, self._falls = self._checkpoint
+        self._checkpoint = None
+
+    def update(self, close, benchmark=None):
+        '''processes the bars of close after the last processed date; a revised last bar is processed again and
+        history that changed before it is recomputed'''
+        close = close.dropna()
+        if self.has_benchmark:
+            # the benchmark is carried forward (and backward before its first bar) on the days it did not trade
+            benchmark = benchmark.reindex(close.index).ffill().bfill().to_numpy(dtype=float)
+        else:
+            benchmark = np.ones(len(close))
+        values = close.to_numpy(dtype=float)
+        with self._lock:
+            n = len(self.dates)
+            if n and not self._same_bar(close.index, values, benchmark, n - 1):
+                if n > 1 and self._same_bar(close.index, values, benchmark, n - 2):
+                    self._rollback()  # only the last bar revised (e.g. a bar cached during the session): redo it
+                    n -= 1
+                else:
+                    self._reset()  # older bars revised or removed: start over
+                    n = 0
+            if len(values) > n:
+                self._append(close.index[n:], values[n:], benchmark[n:])
+            return self
+
+    def _append(self, dates, close, benchmark):
+        start = len(self._close)
+        self.dates = self.dates.append(pd.DatetimeIndex(dates, name="Date"))
+        self._close = np.concatenate([self._close, close])
+        self._benchmark = np.concatenate([self._benchmark, benchmark])
+        all_close, all_benchmark = self._close, self._benchmark
+
+        # prefix sums extended with the returns of the new bars (there is no return before the first bar)
+        previous = max(start - 1, 0)
+        r = np.diff(np.log(all_close[previous:]))
+        b = np.diff(np.log(all_benchmark[previous:]))
+        if start == 0:
+            r, b = np.concatenate([[0.0], r]), np.concatenate([[0.0], b])
+        terms = np.vstack([r, r * r, np.minimum(r, 0.0) ** 2, b, b * b, r * b])
+        self._sums = np.hstack([self._sums, self._sums[:, -1:] + np.cumsum(terms, axis=1)])
+
+        # window moments from prefix differences: the window of day i holds the returns of days i - window + 1 .. i
+        ends = np.arange(start, len(all_close))
+        w = self.window
+        valid = ends >= w
+        lows = np.maximum(ends - w + 1, 0)
+        totals = self._sums[:, ends + 1] - self._sums[:, lows]
+        mean, mean_square, down_square, bench_mean, bench_square, cross = totals / w
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = (mean_square - mean ** 2) * w / (w - 1)
+            volatility = np.sqrt(np.maximum(variance, 0.0) * TRADING_DAYS)
+            excess = mean * TRADING_DAYS - self.risk_free
+            sharpe = excess / volatility
+            sortino = excess / np.sqrt(down_square * TRADING_DAYS)
+            bench_variance = bench_square - bench_mean ** 2
+            beta = (cross - mean * bench_mean) / bench_variance if self.has_benchmark else np.full(len(ends), np.nan)
+
+        # drawdowns over the window prices (days i - window .. i)
+        max_drawdown, drawdown, duration = np.empty(len(ends)), np.empty(len(ends)), np.empty(len(ends))
+        log_close = np.log(all_close)
+        peaks, falls = self._peaks, self._falls
+        for k, i in enumerate(ends):
+            if i == len(all_close) - 1:
+                self._checkpoint = (peaks.copy(), falls.copy())
+            while peaks and all_close[peaks[-1]] <= all_close[i]:
+                peaks.pop()
+            peaks.append(i)
+            if peaks[0] < i - w:
+                peaks.popleft()
+            falls.push(log_close[i])
+            if i > w:
+                falls.pop()
+            max_drawdown[k] = np.expm1(-falls.largest_fall())
+            drawdown[k] = all_close[i] / all_close[peaks[0]] - 1
+            duration[k] = i - peaks[0]
+
+        results = np.column_stack([volatility, sharpe, sortino, beta, max_drawdown, drawdown, duration])
+        results[~valid] = np.nan
+        self._results = np.vstack([self._results, results])
+
+    def frame(self):
+        '''DataFrame of every metric (columns RISK_COLUMNS) for each day with a full window'''
+        with self._lock:
+            return pd.DataFrame(self._results, index=self.dates, columns=RISK_COLUMNS).dropna(how="all")
+
+    def latest(self):
+        '''dictionary of the metrics of the last day'''
+        frame = self.frame()
+        if frame.empty:
+            raise ValueError(f"History too short for a {self.window}-day window.")
+        return frame.iloc[-1].to_dict()
+
+
+def rolling_risk(ticker_symbol, prices, years, benchmark_symbol=None, benchmark_prices=None):
+    '''returns the cached RollingRisk of ticker_symbol over years-year windows, updated with the bars appended
+    to prices (and benchmark_prices) since it was computed'''
+    key = (ticker_symbol, "rolling_risk", (years, benchmark_symbol))
+    benchmark = benchmark_prices["Close"] if benchmark_prices is not None else None
+    engine = analytics_cache.get(key)
+    if engine is None or engine.has_benchmark != (benchmark is not None):
+        engine = RollingRisk(prices["Close"], years * TRADING_DAYS, benchmark)
+    else:
+        engine.update(prices["Close"], benchmark)
+    return analytics_cache.put(key, engine)  # stored again, so the cache accounts for the new bars
@@ -0,0 +1,92 @@
+import numpy as np
+
+from analytics import analytics_cache, history_key
+
+#####-----SAVINGS PLAN BACKTESTER-----#################################################################################################################################
+
+PERIODS_PER_YEAR = {"Yearly": 1, "Quarterly": 4, "Monthly": 12}
+PERCENTILES = [5, 25, 50, 75, 95]
+BOOTSTRAP_PATHS = 20_000
+
+
+def _days(dates):
+    '''trading dates as int day numbers in their local timezone'''
+    return dates.tz_localize(None).values.astype("datetime64[D]").astype(np.int64)
+
+
+def _shift_months(days, months):
+    '''shifts day numbers by whole months (day of month clipped to the month length), for an array of month offsets'''
+    dates = days.astype("datetime64[D]")
+    month_start = dates.astype("datetime64[M]")
+    day_in_month = (dates - month_start.astype("datetime64[D]")).astype(np.int64)
+    target_month = month_start[np.newaxis, :] + np.asarray(months)[:, np.newaxis]
+    month_length = ((target_month + 1).astype("datetime64[D]") - target_month.astype("datetime64[D]")).astype(np.int64)
+    return target_month.astype("datetime64[D]").astype(np.int64) + np.minimum(day_in_month, month_length - 1)
+
+
+def historical_outcomes(close, years, period):
+    '''final value of a plan investing 1 at the start of every period for years, for every historical start date.
+    All start dates are simulated at once: contribution i buys at the last close on or before its date
+    and is worth close[end] / close[i] at the end of the plan.'''
+    n = PERIODS_PER_YEAR[period]
+    close = close.dropna()
+    days = _days(close.index)
+    prices = close.to_numpy(dtype=float)
+
+    months = np.arange(years * n + 1) * (12 // n)  # contribution dates, the last row is the end of the plan
+    targets = _shift_months(days, months)
+    positions = np.searchsorted(days, targets, side="right") - 1
+    complete = targets[-1] <= days[-1]  # only starts whose plan ended inside the history
+    positions = positions[:, complete]
+    if positions.shape[1] == 0:
+        raise ValueError(f"History too short for a {years}-year plan.")
+
+    end_prices = prices[positions[-1]]
+    units = (1 / prices[positions[:-1]]).sum(axis=0)  # shares bought with 1 per contribution
+    return units * end_prices
+
+
+def period_returns(close, period):
+    '''all (overlapping) historical returns over one contribution period, the pool resampled by the bootstrap'''
+    n = PERIODS_PER_YEAR[period]
+    close = close.dropna()
+    days = _days(close.index)
+    targets = _shift_months(days, [12 // n])[0]
+    ends = np.searchsorted(days, targets, side="right") - 1
+    complete = targets <= days[-1]
+    prices = close.to_numpy(dtype=float)
+    return prices[ends[complete]] / prices[complete] - 1
+
+
+def bootstrap_outcomes(close, years, period, paths=BOOTSTRAP_PATHS, seed=0):
+    '''final values of resampled plans: each path draws its period returns from the historical ones'''
+    n = PERIODS_PER_YEAR[period]
+    pool = period_returns(close, period)
+    if len(pool) == 0:
+        raise ValueError("History too short to resample returns.")
+    rng = np.random.default_rng(seed)
+    growth = 1 + pool[rng.integers(0, len(pool), size=(paths, years * n))]
+    # contribution k grows with every period from k to the end: reversed cumulative product
+    return np.cumprod(growth[:, ::-1], axis=1).sum(axis=1)
+
+
+def plan_outcomes(ticker_symbol, prices, years, period, mode="Historical"):
+    '''returns the cached final values of a plan investing 1 per period ("Historical" or "Bootstrap" mode)'''
+    key = (ticker_symbol, "savings_plan", (years, period, mode, history_key(prices)))
+    if mode == "Bootstrap":
+        return analytics_cache.get_or_compute(key, lambda: bootstrap_outcomes(prices["Close"], years, period))
+    return analytics_cache.get_or_compute(key, lambda: historical_outcomes(prices["Close"], years, period))
+
+
+def summarize(outcomes, amount, years, period):
+    '''returns a dictionary with the invested amount and the distribution of the final values'''
+    values = outcomes * amount
+    summary = {
+        "invested": amount * years * PERIODS_PER_YEAR[period],
+        "scenarios": len(values),
+        "min": values.min(),
+        "max": values.max(),
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{percentile}"] = value
+    return summary
@@ -0,0 +1,224 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from derived_cache import size_of
+from metrics import record_payload, register_cache, timed
+from price_cache import PriceCache
+from providers import PriceProvider, YFinanceProvider
+from recorder import DEFAULT_RECORD_DIR, REPLAY, RecordingProvider
+
+#####-----PROCESS-WIDE READ-THROUGH CACHE-----#################################################################################################################################
+
+# seconds each kind of upstream answer is shared between sessions before it is fetched again
+# (price histories are not in this cache: the PriceCache above it already keeps them)
+DEFAULT_TTLS = {
+    "history_1d": 60,
+    "info": 60,
+    "news": 300,
+    "funds_data": 24 * 3600,
+}
+
+MAX_ENTRIES = 4096  # answers kept at most (least recently used dropped first)
+
+
+class SharedCache:
+    '''Thread-safe read-through cache with a TTL per entry, bounded to max_entries (least recently used dropped first).
+    Concurrent misses of the same key wait for a single upstream call (single flight), so many sessions asking for
+    a ticker trigger one fetch.'''
+
+    def __init__(self, clock=time.monotonic, max_entries=MAX_ENTRIES):
+        self.clock = clock
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expiry time), least recently used first
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> lock held by the caller fetching the key
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, loader, ttl):
+        '''returns the value of key, calling loader() if it is missing or older than ttl seconds'''
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if entry[1] > self.clock():
+                        self.hits += 1
+                        self._entries.move_to_end(key)
+                        return entry[0]
+                    del self._entries[key]  # expired: dropped now, fetched again below
+                flight = self._in_flight.get(key)
+                if flight is None:
+                    flight = self._in_flight[key] = threading.Lock()
+                    flight.acquire()
+                    self.misses += 1
+                    break
+            # another caller is fetching this key: wait for it and read its result
+            with flight:
+                pass
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+            # the other fetch failed: try ourselves
+
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (value, self.clock() + ttl)
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._evict()
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.release()
+
+    def _evict(self):
+        '''drops the expired entries, then the least recently used ones down to max_entries (lock held)'''
+        now = self.clock()
+        for key in [key for key, (_, expiry) in self._entries.items() if expiry <= now]:
+            del self._entries[key]
+            self.evictions += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class CachingProvider(PriceProvider):
+    '''Provider answering from a SharedCache, and from the wrapped provider only on misses or expired entries'''
+
+    def __init__(self, provider, cache=None, ttls=None):
+        self.provider = provider
+        self.cache = cache if cache is not None else SharedCache()
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+
+    def _cached(self, field, key, loader):
+        return self.cache.get((field,) + key, loader, self.ttls[field])
+
+    def history(self, ticker_symbol, start=None):
+        # not cached: the PriceCache keeps the histories (and asks for them once per ticker at a time)
+        return self.provider.history(ticker_symbol, start)
+
+    def history_many(self, ticker_symbols, start=None):
+        return self.provider.history_many(ticker_symbols, start)
+
+    def history_1d(self, ticker_symbol):
+        return self._cached("history_1d", (ticker_symbol,), lambda: self.provider.history_1d(ticker_symbol))
+
+    def info(self, ticker_symbol):
+        return self._cached("info", (ticker_symbol,), lambda: self.provider.info(ticker_symbol))
+
+    def quotes(self, ticker_symbols):
+        # not cached: the quote poller already shares one request per interval between every session
+        return self.provider.quotes(ticker_symbols)
+
+    def news(self, ticker_symbol):
+        return self._cached("news", (ticker_symbol,), lambda: self.provider.news(ticker_symbol))
+
+    def funds_data(self, ticker_symbol):
+        return self._cached("funds_data", (ticker_symbol,), lambda: self.provider.funds_data(ticker_symbol))
+
+
+class InstrumentedProvider(PriceProvider):
+    '''Provider recording the latency, errors and payload size of every upstream call of the wrapped provider'''
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def _call(self, method, *args):
+        with timed("etf_upstream", method=method):
+            value = getattr(self.provider, method)(*args)
+        record_payload(method, value, size_of)
+        return value
+
+    def history(self, ticker_symbol, start=None):
+        return self._call("history", ticker_symbol, start)
+
+    def history_many(self, ticker_symbols, start=None):
+        return self._call("history_many", ticker_symbols, start)
+
+    def history_1d(self, ticker_symbol):
+        return self._call("history_1d", ticker_symbol)
+
+    def info(self, ticker_symbol):
+        return self._call("info", ticker_symbol)
+
+    def quotes(self, ticker_symbols):
+        return self._call("quotes", ticker_symbols)
+
+    def news(self, ticker_symbol):
+        return self._call("news", ticker_symbol)
+
+    def funds_data(self, ticker_symbol):
+        return self._call("funds_data", ticker_symbol)
+
+
+# bounded pool running the blocking network requests of every session concurrently
+FETCH_WORKERS = 32
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+def in_fetch_pool():
+    '''True in a thread of fetch_executor'''
+    return threading.current_thread().name.startswith("fetch_")
+
+
+async def run_in_fetch_pool(function, *args):
+    '''awaits function(*args) run in fetch_executor without blocking the server. Code already running in the pool
+    calls it directly: with every worker waiting for a task queued behind them, the pool would never finish.'''
+    if in_fetch_pool():
+        return function(*args)
+    return await asyncio.get_running_loop().run_in_executor(fetch_executor, function, *args)
+
+# small separate pool for the background prefetch of the tabs not shown yet, so it never delays visible panes
+PREFETCH_WORKERS = 4
+prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+_shared_price_cache = None
+_shared_lock = threading.Lock()
+
+
+def _build_price_cache(provider, ttls=None, record_dir=None, replay=False, **cache_options):
+    '''memory (SharedCache) -> recordings on disk (optional) -> instrumented upstream provider'''
+    upstream = InstrumentedProvider(provider)
+    if record_dir is not None:
+        upstream = RecordingProvider(upstream, record_dir, replay=replay)
+    return PriceCache(CachingProvider(upstream, ttls=ttls), **cache_options)
+
+
+def get_price_cache():
+    '''returns the process-wide price cache shared by every session (created on first use)'''
+    global _shared_price_cache
+    with _shared_lock:
+        if _shared_price_cache is None:
+            _shared_price_cache = _build_price_cache(YFinanceProvider(), record_dir=DEFAULT_RECORD_DIR, replay=REPLAY)
+        return _shared_price_cache
+
+
+def set_provider(provider, ttls=None, record_dir=None, replay=False, **cache_options):
+    '''replaces the upstream provider of every session (e.g. a FakeProvider for offline runs and load tests),
+    recording its quotes, info, news and holdings in record_dir when given'''
+    global _shared_price_cache
+    with _shared_lock:
+        _shared_price_cache = _build_price_cache(provider, ttls, record_dir, replay, **cache_options)
+        return _shared_price_cache
+
+
+def _recording_stats():
+    upstream = get_price_cache().provider.provider
+    return upstream.stats() if isinstance(upstream, RecordingProvider) else {}
+
+
+register_cache("upstream", lambda: get_price_cache().provider.cache.stats())
+register_cache("price_history", lambda: get_price_cache().stats())
+register_cache("recordings", _recording_stats)
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from providers import YFinanceProvider
+
+#####-----PER-TICKER SNAPSHOT-----#################################################################################################################################
+
+MAX_SNAPSHOTS = 32  # snapshots kept alive for the bound functions (oldest dropped first)
+SNAPSHOT_TTL = 15 * 60  # seconds a shared snapshot is reused before a lookup starts a fresh one
+
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+class TickerSnapshot:
+    '''Fetches each yfinance field of one ticker at most once and shares it with every pane of a refresh.
+    Concurrent callers asking for the same field wait for a single fetch. An error is raised to the callers waiting for
+    that fetch but never stored, so the next caller tries again.'''
+
+    def __init__(self, ticker_symbol, price_cache=None, provider=None, clock=time.monotonic):
+        self.ticker_symbol = ticker_symbol.strip().upper()
+        self.price_cache = price_cache
+        if provider is None:
+            provider = price_cache.provider if price_cache is not None else YFinanceProvider()
+        self.provider = provider
+        self.created = clock()
+        self._values = {}  # field -> value
+        self._in_flight = {}  # field -> Future of the fetch running for it
+        self._lock = threading.Lock()
+
+    @classmethod
+    def preloaded(cls, ticker_symbol, **fields):
+        '''returns a snapshot whose fields (info, history_1d, news, funds_data, history) are already known'''
+        snapshot = cls(ticker_symbol, provider=_NO_PROVIDER)
+        for field, value in fields.items():
+            snapshot._values[field] = value
+        return snapshot
+
+    def _get(self, field, fetch):
+        '''returns the value of field, calling fetch only once for every concurrent caller'''
+        with self._lock:
+            if field in self._values:
+                return self._values[field]
+            flight = self._in_flight.get(field)
+            fetching = flight is None
+            if fetching:
+                flight = self._in_flight[field] = Future()
+        if not fetching:
+            return flight.result()  # the value, or the error, of the fetch in flight
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[field]
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            self._values[field] = value
+            del self._in_flight[field]
+        flight.set_result(value)
+        return value
+
+    @property
+    def info(self):
+        return self._get("info", lambda: self.provider.info(self.ticker_symbol))
+
+    @property
+    def history_1d(self):
+        return self._get("history_1d", lambda: self.provider.history_1d(self.ticker_symbol))
+
+    @property
+    def news(self):
+        return self._get("news", lambda: self.provider.news(self.ticker_symbol))
+
+    @property
+    def funds_data(self):
+        return self._get("funds_data", lambda: self.provider.funds_data(self.ticker_symbol))
+
+    @property
+    def history(self):
+        '''full daily history, read through the price cache when one is given'''
+        if self.price_cache is not None:
+            return self._get("history", lambda: self.price_cache.get_history(self.ticker_symbol))
+        return self._get("history", lambda: self.provider.history(self.ticker_symbol))
+
+
+class _NoProvider:
+    '''provider of preloaded snapshots: any field that was not given is an error'''
+
+    def __getattr__(self, name):
+        def missing(ticker_symbol, *args, **kwargs):
+            raise LookupError(f"{name} of {ticker_symbol} was not preloaded.")
+        return missing
+
+
+_NO_PROVIDER = _NoProvider()
+
+
+def get_snapshot(ticker_symbol, price_cache=None, refresh=False, clock=time.monotonic):
+    '''returns the shared snapshot of ticker_symbol, a new one (fresh data) if refresh is True or it is older than SNAPSHOT_TTL'''
+    ticker_symbol = ticker_symbol.strip().upper()
+    with _snapshots_lock:
+        snapshot = _snapshots.get(ticker_symbol)
+        if snapshot is None or refresh or clock() - snapshot.created >= SNAPSHOT_TTL:
+            snapshot = TickerSnapshot(ticker_symbol, price_cache, clock=clock)
+            _snapshots[ticker_symbol] = snapshot
+        _snapshots.move_to_end(ticker_symbol)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+        return snapshot
+
+
+def clear_snapshots():
+    '''forgets every shared snapshot, so the next lookups fetch fresh data'''
+    with _snapshots_lock:
+        _snapshots.clear()
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from batch import COLUMNS, ResultWriter
+
+
+def _row(**values):
+    row = {column: (1.0 if kind is float else "x") for column, kind in COLUMNS.items()}
+    row.update(benchmark=None, error=None)
+    row.update(values)
+    return row
+
+
+def test_parquet_chunks_keep_their_schema_when_the_first_has_no_errors(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "screen.parquet")
+    writer = ResultWriter(path)
+    writer.write([_row(ticker="SPY")])
+    writer.write([_row(ticker="BAD", benchmark="URTH", error="No price data available for BAD.")])
+    writer.close()
+
+    result = pd.read_parquet(path)
+
+    assert list(result["ticker"]) == ["SPY", "BAD"]
+    assert result["error"].isna().tolist() == [True, False]
+    assert result.loc[1, "benchmark"] == "URTH"
@@ -0,0 +1,13 @@
+import pandas as pd
+
+from holdings_table import holdings_index
+
+
+def test_index_is_rebuilt_when_a_holding_is_swapped_for_one_of_the_same_weight():
+    holdings = pd.DataFrame({"Name": ["Apple", "Microsoft"], "Holding Percent": [0.07, 0.06]},
+                            index=pd.Index(["AAPL", "MSFT"], name="Symbol"))
+    swapped = holdings.rename(index={"MSFT": "NVDA"}, errors="raise").assign(Name=["Apple", "Nvidia"])
+
+    assert holdings_index("TEST", holdings).frame["Symbol"].tolist() == ["AAPL", "MSFT"]
+    assert holdings_index("TEST", swapped).frame["Name"].tolist() == ["Apple", "Nvidia"]
+    assert holdings_index("TEST", holdings.copy()) is holdings_index("TEST", holdings)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from overlap import OverlapEngine
+
+
+def random_holdings(rng, securities=300, holdings=40):
+    symbols = rng.choice(securities, size=holdings, replace=False)
+    weights = rng.dirichlet(np.ones(holdings)) * 0.9
+    return pd.DataFrame({"Holding Percent": weights}, index=pd.Index([f"S{symbol}" for symbol in symbols], name="Symbol"))
+
+
+@pytest.fixture
+def universe():
+    rng = np.random.default_rng(0)
+    return {f"ETF{i}": random_holdings(rng) for i in range(40)}, rng
+
+
+def build(funds):
+    engine = OverlapEngine()
+    for ticker, holdings in funds.items():
+        engine.update(ticker, holdings, {})
+    return engine
+
+
+@pytest.mark.parametrize("ticker", ["ETF7", "NEW"])
+def test_updated_fund_matches_a_full_build(universe, ticker):
+    funds, rng = universe
+    engine = build(funds)
+    engine.overlap_matrix()
+
+    funds[ticker] = random_holdings(rng)
+    engine.update(ticker, funds[ticker], {})
+    overlap, similarity = engine.overlap_matrix(), engine.similarity_matrix()
+
+    assert (engine.full_builds, engine.row_updates) == (1, 1)
+    fresh = build(funds)
+    order = fresh.tickers
+    pd.testing.assert_frame_equal(overlap.loc[order, order], fresh.overlap_matrix())
+    pd.testing.assert_frame_equal(similarity.loc[order, order], fresh.similarity_matrix())
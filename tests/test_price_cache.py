@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+from price_cache import PriceCache, normalize_history
+from providers import FakeProvider
+
+
+class AdjustingProvider(FakeProvider):
+    '''FakeProvider re-adjusting every bar before the ex-dividend date, like yfinance's auto-adjusted prices'''
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.ex_date = None
+        self.factor = 1.0
+
+    def full_history(self, ticker_symbol):
+        prices = super().full_history(ticker_symbol)
+        if self.ex_date is not None:
+            before = prices.index < pd.Timestamp(self.ex_date, tz=prices.index.tz)
+            prices.loc[before, ["Open", "High", "Low", "Close"]] *= self.factor
+        return prices
+
+
+@pytest.fixture
+def provider():
+    return AdjustingProvider(years=2, end="2024-06-28")
+
+
+def full_history(provider, ticker_symbol):
+    return normalize_history(provider.full_history(ticker_symbol))
+
+
+def test_incremental_refresh_appends_only_new_bars(tmp_path, provider):
+    cache = PriceCache(provider, cache_dir=str(tmp_path), refresh_interval=0)
+    first = cache.get_history("SPY")
+    provider.end = pd.Timestamp("2024-07-31")
+    provider.calls.clear()
+
+    refreshed = cache.get_history("SPY")
+
+    assert provider.calls == [("history", "SPY", first.index[-2].date())]
+    assert len(refreshed) > len(first)
+    pd.testing.assert_frame_equal(refreshed, full_history(provider, "SPY"), check_freq=False)
+
+
+def test_refresh_downloads_again_after_an_adjustment(tmp_path, provider):
+    cache = PriceCache(provider, cache_dir=str(tmp_path), refresh_interval=0)
+    cache.get_history("SPY")
+    provider.end = pd.Timestamp("2024-07-31")
+    provider.ex_date, provider.factor = "2024-07-15", 0.98
+    provider.calls.clear()
+
+    refreshed = cache.get_history("SPY")
+
+    assert [start for _, _, start in provider.calls][-1] is None  # full download
+    pd.testing.assert_frame_equal(refreshed, full_history(provider, "SPY"), check_freq=False)
+
+
+def test_get_many_downloads_again_the_adjusted_histories(tmp_path, provider):
+    cache = PriceCache(provider, cache_dir=str(tmp_path), refresh_interval=0)
+    cache.get_many(["SPY", "QQQ"])
+    provider.end = pd.Timestamp("2024-07-31")
+    provider.ex_date, provider.factor = "2024-07-15", 0.98
+
+    histories = cache.get_many(["SPY", "QQQ"])
+
+    assert provider.calls[-1] == ("history_many", ("SPY", "QQQ"), None)
+    for ticker_symbol in ("SPY", "QQQ"):
+        pd.testing.assert_frame_equal(histories[ticker_symbol], full_history(provider, ticker_symbol), check_freq=False)
+
+
+def test_memory_keeps_the_most_recent_histories(tmp_path, provider):
+    cache = PriceCache(provider, cache_dir=str(tmp_path), max_memory=2)
+    for ticker_symbol in ("SPY", "QQQ", "GLD"):
+        cache.get_history(ticker_symbol)
+    provider.calls.clear()
+
+    cache.get_history("SPY")  # dropped from memory, read back from disk
+
+    assert cache.stats()["entries"] == 2
+    assert provider.calls == []
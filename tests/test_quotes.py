@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pandas as pd
+
+from providers import YFinanceProvider
+from quotes import QuotePoller
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_watch_after_stop_restarts_polling_while_the_old_thread_finishes():
+    gate, entered, polls = threading.Event(), threading.Event(), []
+    gate.set()
+
+    def source(ticker_symbols):
+        entered.set()
+        gate.wait(5)
+        polls.append(None)
+        return {ticker_symbol: {"bid": len(polls)} for ticker_symbol in ticker_symbols}
+
+    poller = QuotePoller(source=source, interval=0.01)
+    poller.watch("SPY")
+    wait_until(lambda: poller.latest("SPY")[0] >= 1)
+    # the thread is stopped in the middle of a poll, so it is still alive when watch is called again
+    gate.clear()
+    entered.clear()
+    entered.wait(5)
+    old_thread = poller._thread
+    poller.stop(timeout=0)
+    assert old_thread.is_alive()
+    version, _ = poller.latest("SPY")
+
+    poller.watch("SPY")
+    gate.set()
+
+    try:
+        wait_until(lambda: poller.latest("SPY")[0] >= version + 3)  # the old thread adds at most one
+    finally:
+        poller.stop()
+    assert not old_thread.is_alive()
+
+
+class PerTickerProvider(YFinanceProvider):
+    def info(self, ticker_symbol):
+        return {"bid": 1.0, "ask": 1.1, "currency": "USD"}
+
+    def history_1d(self, ticker_symbol):
+        return pd.DataFrame({"Volume": [100]})
+
+
+def test_quotes_fall_back_to_per_ticker_requests(monkeypatch):
+    from yfinance.data import YfData
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("quote endpoint gone")
+
+    monkeypatch.setattr(YfData, "get_raw_json", unavailable)
+
+    quotes = PerTickerProvider().quotes(["SPY", "QQQ"])
+
+    assert quotes == {ticker: {"bid": 1.0, "ask": 1.1, "currency": "USD", "volume": 100} for ticker in ["SPY", "QQQ"]}
@@ -0,0 +1,65 @@
+import pytest
+
+from recorder import RecordingProvider
+
+
+class CountingProvider:
+    '''upstream answering the request number, failing while down'''
+
+    def __init__(self):
+        self.calls = 0
+        self.down = False
+
+    def info(self, ticker_symbol):
+        if self.down:
+            raise ConnectionError("upstream down")
+        self.calls += 1
+        return {"symbol": ticker_symbol, "call": self.calls}
+
+
+@pytest.fixture
+def now():
+    return [1000.0]
+
+
+def recorder(tmp_path, upstream, now, replay=False):
+    return RecordingProvider(upstream, record_dir=str(tmp_path), ttls={"info": 60}, replay=replay, clock=lambda: now[0])
+
+
+def test_recording_is_served_within_its_ttl_and_fetched_again_after(tmp_path, now):
+    upstream = CountingProvider()
+    provider = recorder(tmp_path, upstream, now)
+
+    assert provider.info("SPY")["call"] == 1
+    now[0] += 59
+    assert provider.info("SPY")["call"] == 1
+    now[0] += 1
+    assert provider.info("SPY")["call"] == 2
+    assert provider.stats() == {"hits": 1, "misses": 2, "stale": 0}
+
+
+def test_expired_recording_is_served_when_upstream_fails(tmp_path, now):
+    upstream = CountingProvider()
+    provider = recorder(tmp_path, upstream, now)
+    provider.info("SPY")
+    now[0] += 3600
+    upstream.down = True
+
+    assert provider.info("SPY")["call"] == 1
+    assert provider.stats()["stale"] == 1
+    with pytest.raises(ConnectionError):
+        provider.info("QQQ")  # nothing recorded to fall back on
+
+
+def test_replay_serves_recordings_only(tmp_path, now):
+    upstream = CountingProvider()
+    recorder(tmp_path, upstream, now).info("SPY")
+    replay = recorder(tmp_path, upstream, now, replay=True)
+    now[0] += 30 * 24 * 3600  # however old the recording is
+
+    assert replay.info("SPY")["call"] == 1
+    with pytest.raises(LookupError):
+        replay.info("QQQ")
+    with pytest.raises(LookupError):
+        replay.news("SPY")
+    assert upstream.calls == 1
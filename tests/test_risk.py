@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk import TRADING_DAYS, RollingRisk
+
+WINDOW = 60
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=600, name="Date")
+    close = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates)))), index=dates)
+    benchmark = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.008, len(dates)))), index=dates)
+    return close, benchmark
+
+
+def naive_risk(close, benchmark, window):
+    '''the metrics recomputed with pandas rolling windows, day by day for the drawdown'''
+    r, b = np.log(close).diff(), np.log(benchmark).diff()
+    max_drawdown = pd.Series(np.nan, index=close.index)
+    for i in range(window, len(close)):
+        window_prices = close.iloc[i - window:i + 1]
+        max_drawdown.iloc[i] = (window_prices / window_prices.cummax() - 1).min()
+    return pd.DataFrame({
+        "Volatility": r.rolling(window).std() * np.sqrt(TRADING_DAYS),
+        "Beta": r.rolling(window).cov(b) / b.rolling(window).var(),
+        "Max Drawdown": max_drawdown,
+    }).iloc[window:]
+
+
+def test_metrics_match_a_naive_rolling_computation(prices):
+    close, benchmark = prices
+
+    frame = RollingRisk(close, WINDOW, benchmark).frame()
+
+    expected = naive_risk(close, benchmark, WINDOW)
+    pd.testing.assert_frame_equal(frame[expected.columns], expected, check_freq=False, rtol=1e-9, atol=1e-12)
+
+
+def test_appended_bars_are_processed_without_a_rebuild(prices):
+    close, benchmark = prices
+    engine = RollingRisk(close.iloc[:-5], WINDOW, benchmark.iloc[:-5])
+
+    engine.update(close, benchmark)
+
+    assert engine.rebuilds == 0
+    pd.testing.assert_frame_equal(engine.frame(), RollingRisk(close, WINDOW, benchmark).frame())
+
+
+def test_a_revised_last_bar_is_processed_again_without_a_rebuild(prices):
+    close, benchmark = prices
+    intraday = close.iloc[:-5].copy()
+    intraday.iloc[-1] *= 1.01  # the last bar was cached before the close
+    engine = RollingRisk(intraday, WINDOW, benchmark.iloc[:-5])
+
+    engine.update(close, benchmark)
+    engine.update(close.iloc[:-1], benchmark)  # the newest bar withdrawn, then back
+    engine.update(close, benchmark)
+
+    assert engine.rebuilds == 0
+    pd.testing.assert_frame_equal(engine.frame(), RollingRisk(close, WINDOW, benchmark).frame())
+
+
+def test_older_revisions_rebuild_the_history(prices):
+    close, benchmark = prices
+    engine = RollingRisk(close.iloc[:-5], WINDOW, benchmark.iloc[:-5])
+    revised = close.copy()
+    revised.iloc[:-3] *= 0.99  # adjusted for a dividend paid after the processed bars
+
+    engine.update(revised, benchmark)
+
+    assert engine.rebuilds == 1
+    pd.testing.assert_frame_equal(engine.frame(), RollingRisk(revised, WINDOW, benchmark).frame())
@@ -0,0 +1,17 @@
+from shared_cache import SharedCache
+
+
+def test_entries_are_bounded_and_expired_ones_dropped():
+    now = [0.0]
+    cache = SharedCache(clock=lambda: now[0], max_entries=2)
+    cache.get("a", lambda: 1, ttl=10)
+    cache.get("b", lambda: 2, ttl=10)
+    cache.get("a", lambda: 0, ttl=10)  # hit: "b" is now the least recently used
+    cache.get("c", lambda: 3, ttl=10)
+
+    assert cache.get("a", lambda: 0, ttl=10) == 1
+    assert cache.get("b", lambda: 20, ttl=10) == 20  # evicted, fetched again
+
+    now[0] = 10
+    assert cache.get("a", lambda: 10, ttl=10) == 10  # expired
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,38 @@
+from snapshot import SNAPSHOT_TTL, TickerSnapshot, get_snapshot
+
+
+class FlakyProvider:
+    '''provider whose info fails until it recovers'''
+
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+
+    def info(self, ticker_symbol):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("upstream down")
+        return {"shortName": ticker_symbol}
+
+
+def test_errors_are_not_kept_after_the_provider_recovered():
+    provider = FlakyProvider()
+    snapshot = TickerSnapshot("spy", provider=provider)
+    try:
+        snapshot.info
+    except ConnectionError:
+        pass
+    provider.down = False
+
+    assert snapshot.info == {"shortName": "SPY"}
+    assert snapshot.info == {"shortName": "SPY"}
+    assert provider.calls == 2
+
+
+def test_shared_snapshots_expire():
+    now = [0.0]
+    clock = lambda: now[0]
+    first = get_snapshot("TTL", clock=clock)
+    assert get_snapshot("TTL", clock=clock) is first
+    now[0] = SNAPSHOT_TTL
+    assert get_snapshot("TTL", clock=clock) is not first